@@ -6,8 +6,15 @@ import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 import ast
+import csv
+import io
 import json
+import math
+import orjson
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="Decarbonization Tool", layout="wide")
@@ -17,6 +24,31 @@ FUEL_DB_PATH = "fuel_energy.db"
 PROJECT_DB_PATH = "co2_calculator.db"  # New DB for Project module
 
 
+@st.cache_resource
+def get_conn(path):
+    """Shared SQLite connection per database file (reused across reruns)"""
+    # Default isolation level is kept so `with conn:` commits/rolls back atomically
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    conn.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+    return conn
+
+
+# The get_conn connections are shared by every session thread, and a transaction belongs to the
+# connection: writes take this lock so concurrent saves can't join or roll back each other's statements.
+_WRITE_LOCK = threading.Lock()
+
+
+@contextmanager
+def write_txn(conn):
+    """One write transaction on a shared connection: serialised, committed on success, rolled back on error"""
+    with _WRITE_LOCK, conn:
+        yield conn
+
+
 def init_databases():
     # Main NPV/MACC database - UPDATED WITH ALL NEW COLUMNS
     conn = sqlite3.connect(DB_PATH)
@@ -173,6 +205,37 @@ def init_databases():
             FOREIGN KEY (project_code) REFERENCES projects(project_code)
         )
     ''')
+    # Tracking rows are always looked up / deleted by project_code, then read per year.
+    # Covering indexes: the tracking queries are answered from the index alone, and the project_code
+    # prefix replaces the earlier single-column indexes.
+    # (projects.project_code and projects.project_name are already covered by their UNIQUE indexes)
+    conn.execute("DROP INDEX IF EXISTS idx_actuals_project_code")
+    conn.execute("DROP INDEX IF EXISTS idx_amp_actuals_project_code")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_actuals_code_year
+        ON project_actuals(project_code, year_number, section_type, row_index, absolute_value, specific_value)
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_amp_code_year ON amp_actuals_tracking(project_code, year_number, amp_value)")
+    # One actual per (project, section, row, year) and one AMP per (project, year), so saves can UPSERT.
+    # Older databases may hold repeated saves of the same key: keep the latest before adding the index.
+    existing_indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    if 'uq_actuals_row_year' not in existing_indexes:
+        conn.execute('''
+            DELETE FROM project_actuals WHERE id NOT IN (
+                SELECT MAX(id) FROM project_actuals GROUP BY project_code, section_type, row_index, year_number
+            )
+        ''')
+        conn.execute('''
+            CREATE UNIQUE INDEX uq_actuals_row_year
+            ON project_actuals(project_code, section_type, row_index, year_number)
+        ''')
+    if 'uq_amp_year' not in existing_indexes:
+        conn.execute('''
+            DELETE FROM amp_actuals_tracking WHERE id NOT IN (
+                SELECT MAX(id) FROM amp_actuals_tracking GROUP BY project_code, year_number
+            )
+        ''')
+        conn.execute("CREATE UNIQUE INDEX uq_amp_year ON amp_actuals_tracking(project_code, year_number)")
     conn.commit()
     conn.close()
 
@@ -350,6 +413,7 @@ def save_calculation_to_db(save_data):
 
         conn.commit()
         conn.close()
+        get_fuel_organizations.clear()
         return True
 
     except Exception as e:
@@ -555,6 +619,7 @@ def fuel_energy_calculator_ui():
                     conn.execute("DELETE FROM calculations WHERE unique_code = ?", (selected,))
                     conn.commit()
                     conn.close()
+                    get_fuel_organizations.clear()
                     st.success("Deleted successfully")
                     st.rerun()
                 except Exception as e:
@@ -2381,21 +2446,28 @@ def option_fields_tab2(prefix, opt, is_o1=True):
 def strategy_dashboard_ui():
     st.header("🌿 Decarbonization Strategy Dashboard")
 
+    ss = st.session_state
+
     # Initialize session state for button actions
-    if 'strategy_action' not in st.session_state:
-        st.session_state.strategy_action = None
+    if 'strategy_action' not in ss:
+        ss.strategy_action = None
 
     # Initialize session state for confirmation
-    if 'confirm_delete_id' not in st.session_state:
-        st.session_state.confirm_delete_id = None
+    if 'confirm_delete_id' not in ss:
+        ss.confirm_delete_id = None
 
     # Initialize session state for loaded dashboard
-    if 'loaded_dashboard_id' not in st.session_state:
-        st.session_state.loaded_dashboard_id = None
+    if 'loaded_dashboard_id' not in ss:
+        ss.loaded_dashboard_id = None
 
     # Initialize session state for new dashboard name
-    if 'new_dashboard_name' not in st.session_state:
-        st.session_state.new_dashboard_name = "My Strategy Portfolio"
+    if 'new_dashboard_name' not in ss:
+        ss.new_dashboard_name = "My Strategy Portfolio"
+
+    # Bind the per-rerun reads once; writes still go through the proxy (and are followed by st.rerun())
+    action = ss.strategy_action
+    loaded_id = ss.loaded_dashboard_id
+    confirm_del = ss.confirm_delete_id
 
     # === Database Setup ===
     STRATEGY_DB = "strategy_dashboards.db"
@@ -2464,20 +2536,19 @@ def strategy_dashboard_ui():
 
         # New Button
         if btn_col1.button("🆕 New", use_container_width=True, key="btn_new_strategy"):
-            st.session_state.strategy_action = "new"
-            st.session_state.loaded_dashboard_id = None
-            st.session_state.new_dashboard_name = get_unique_dashboard_name()
+            ss.strategy_action = "new"
+            ss.loaded_dashboard_id = None
+            ss.new_dashboard_name = get_unique_dashboard_name()
             st.rerun()
 
         # Load Button
         if btn_col2.button("📂 Load", use_container_width=True, key="btn_load_strategy"):
-            st.session_state.strategy_action = "load"
+            ss.strategy_action = "load"
             st.rerun()
 
         # If Load action is selected, show dashboard selection
-        if st.session_state.strategy_action == "load":
-            st.markdown("---")
-            st.markdown("#### Select Dashboard to Load")
+        if action == "load":
+            st.markdown("---\n#### Select Dashboard to Load")
 
             if not saved_dashboards.empty:
                 # Create a selection list
@@ -2507,10 +2578,10 @@ def strategy_dashboard_ui():
                             loaded_name, loaded_org, loaded_sector, loaded_baseline_id, loaded_macc_str = row
 
                             # Store loaded data in session state
-                            st.session_state.loaded_dashboard_id = dashboard_id
-                            st.session_state.current_org_name = loaded_org
-                            st.session_state.current_sector = loaded_sector
-                            st.session_state.selected_calc_id = loaded_baseline_id
+                            ss.loaded_dashboard_id = dashboard_id
+                            ss.current_org_name = loaded_org
+                            ss.current_sector = loaded_sector
+                            ss.selected_calc_id = loaded_baseline_id
 
                             # Load MACC projects
                             if loaded_macc_str:
@@ -2518,56 +2589,55 @@ def strategy_dashboard_ui():
                                     loaded_macc_ids = ast.literal_eval(loaded_macc_str)
                                     all_projects = get_saved_macc_projects()
                                     loaded_names = [p['name'] for p in all_projects if p['id'] in loaded_macc_ids]
-                                    st.session_state.strategy_macc_select = loaded_names
+                                    ss.strategy_macc_select = loaded_names
                                 except:
-                                    st.session_state.strategy_macc_select = []
+                                    ss.strategy_macc_select = []
 
                             st.success(f"✅ Loaded: **{loaded_name}**")
-                            st.session_state.strategy_action = None
+                            ss.strategy_action = None
                             st.rerun()
 
                     if col_load2.button("❌ Cancel", use_container_width=True, key="btn_cancel_load"):
-                        st.session_state.strategy_action = None
+                        ss.strategy_action = None
                         st.rerun()
             else:
                 st.info("No saved dashboards found.")
 
         # Save/Update Button
-        if st.session_state.loaded_dashboard_id:
+        if loaded_id:
             # Update button for existing dashboard
             if btn_col1.button("🔄 Update", use_container_width=True, key="btn_update_strategy"):
-                st.session_state.strategy_action = "update"
+                ss.strategy_action = "update"
                 st.rerun()
         else:
             # Save button for new dashboard
             if btn_col2.button("💾 Save", use_container_width=True, key="btn_save_strategy"):
-                st.session_state.strategy_action = "save"
+                ss.strategy_action = "save"
                 st.rerun()
 
         # Delete Button (only shown if a dashboard is loaded)
-        if st.session_state.loaded_dashboard_id and st.session_state.loaded_dashboard_id in saved_dashboards[
-            'id'].values:
+        if loaded_id and loaded_id in saved_dashboards['id'].values:
             if btn_col2.button("🗑️ Delete", use_container_width=True, key="btn_delete_strategy", type="secondary"):
-                st.session_state.confirm_delete_id = st.session_state.loaded_dashboard_id
+                ss.confirm_delete_id = loaded_id
                 st.rerun()
 
         # Handle Save/Update action
-        if st.session_state.strategy_action in ["save", "update"]:
-            st.markdown("---")
-            if st.session_state.strategy_action == "save":
+        if action in ["save", "update"]:
+            st.divider()
+            if action == "save":
                 st.markdown("#### Save New Dashboard")
                 default_name = get_unique_dashboard_name()
-                if 'new_dashboard_name' in st.session_state:
-                    default_name = st.session_state.new_dashboard_name
+                if 'new_dashboard_name' in ss:
+                    default_name = ss.new_dashboard_name
             else:
                 st.markdown("#### Update Dashboard")
                 # Get current dashboard name
                 current_name = ""
-                if st.session_state.loaded_dashboard_id:
+                if loaded_id:
                     conn = sqlite3.connect(STRATEGY_DB)
                     cursor = conn.cursor()
                     cursor.execute("SELECT name FROM strategy_portfolios WHERE id = ?",
-                                   (st.session_state.loaded_dashboard_id,))
+                                   (loaded_id,))
                     result = cursor.fetchone()
                     if result:
                         current_name = result[0]
@@ -2592,7 +2662,7 @@ def strategy_dashboard_ui():
                     conn = sqlite3.connect(STRATEGY_DB)
                     cursor = conn.cursor()
 
-                    if st.session_state.strategy_action == "save":
+                    if action == "save":
                         # Check if name exists for new save
                         cursor.execute("SELECT id FROM strategy_portfolios WHERE name = ?", (dashboard_name.strip(),))
                         existing = cursor.fetchone()
@@ -2602,18 +2672,18 @@ def strategy_dashboard_ui():
                             return
 
                     # Get current data from session state
-                    current_org = st.session_state.get('current_org_name', 'Unknown')
-                    current_sector = st.session_state.get('current_sector', 'Unknown')
-                    current_calc_id = st.session_state.get('selected_calc_id', '')
-                    current_macc = st.session_state.get('strategy_macc_select', [])
+                    current_org = ss.get('current_org_name', 'Unknown')
+                    current_sector = ss.get('current_sector', 'Unknown')
+                    current_calc_id = ss.get('selected_calc_id', '')
+                    current_macc = ss.get('strategy_macc_select', [])
                     all_projects = get_saved_macc_projects()
                     macc_ids = [p['id'] for p in all_projects if p['name'] in current_macc]
 
                     # Determine ID
-                    if st.session_state.strategy_action == "save" or not st.session_state.loaded_dashboard_id:
+                    if action == "save" or not loaded_id:
                         save_id = str(uuid.uuid4())[:8]
                     else:
-                        save_id = st.session_state.loaded_dashboard_id
+                        save_id = loaded_id
 
                     # Save to database
                     cursor.execute('''
@@ -2632,28 +2702,27 @@ def strategy_dashboard_ui():
                     conn.close()
 
                     st.success(
-                        f"✅ Dashboard {'saved' if st.session_state.strategy_action == 'save' else 'updated'}: **{dashboard_name.strip()}**")
+                        f"✅ Dashboard {'saved' if action == 'save' else 'updated'}: **{dashboard_name.strip()}**")
 
                     # Update session state
-                    st.session_state.loaded_dashboard_id = save_id
-                    st.session_state.strategy_action = None
+                    ss.loaded_dashboard_id = save_id
+                    ss.strategy_action = None
                     st.rerun()
 
             if col_save2.button("❌ Cancel", use_container_width=True, key="btn_cancel_save"):
-                st.session_state.strategy_action = None
+                ss.strategy_action = None
                 st.rerun()
 
         # Handle Delete confirmation
-        if st.session_state.confirm_delete_id:
-            st.markdown("---")
-            st.markdown("#### Confirm Deletion")
+        if confirm_del:
+            st.markdown("---\n#### Confirm Deletion")
             st.warning("⚠️ Are you sure you want to delete this dashboard? This action cannot be undone.")
 
             # Get dashboard name
             dashboard_name = ""
             conn = sqlite3.connect(STRATEGY_DB)
             cursor = conn.cursor()
-            cursor.execute("SELECT name FROM strategy_portfolios WHERE id = ?", (st.session_state.confirm_delete_id,))
+            cursor.execute("SELECT name FROM strategy_portfolios WHERE id = ?", (confirm_del,))
             result = cursor.fetchone()
             if result:
                 dashboard_name = result[0]
@@ -2663,41 +2732,40 @@ def strategy_dashboard_ui():
 
             if col_del1.button("✅ Yes, Delete", use_container_width=True, type="primary", key="btn_confirm_delete"):
                 conn = sqlite3.connect(STRATEGY_DB)
-                conn.execute("DELETE FROM strategy_portfolios WHERE id = ?", (st.session_state.confirm_delete_id,))
+                conn.execute("DELETE FROM strategy_portfolios WHERE id = ?", (confirm_del,))
                 conn.commit()
                 conn.close()
 
                 # Clear session state if deleting loaded dashboard
-                if st.session_state.loaded_dashboard_id == st.session_state.confirm_delete_id:
-                    st.session_state.loaded_dashboard_id = None
+                if loaded_id == confirm_del:
+                    ss.loaded_dashboard_id = None
                     keys_to_clear = ['current_org_name', 'current_sector', 'selected_calc_id', 'strategy_macc_select']
                     for key in keys_to_clear:
-                        if key in st.session_state:
-                            del st.session_state[key]
+                        if key in ss:
+                            del ss[key]
 
                 st.success(f"✅ Dashboard '{dashboard_name}' deleted successfully!")
-                st.session_state.confirm_delete_id = None
+                ss.confirm_delete_id = None
                 st.rerun()
 
             if col_del2.button("❌ Cancel", use_container_width=True, key="btn_cancel_delete"):
-                st.session_state.confirm_delete_id = None
+                ss.confirm_delete_id = None
                 st.rerun()
 
         # Generate Strategy Report Button
-        st.markdown("---")
+        st.divider()
         if st.button("📈 Generate Strategy Report", use_container_width=True, key="btn_generate_report"):
-            st.session_state.strategy_action = "generate"
+            ss.strategy_action = "generate"
             st.rerun()
 
         # Show current status
-        st.markdown("---")
-        st.markdown("### Current Status")
-        if st.session_state.loaded_dashboard_id:
+        st.markdown("---\n### Current Status")
+        if loaded_id:
             # Get dashboard info
             conn = sqlite3.connect(STRATEGY_DB)
             cursor = conn.cursor()
             cursor.execute("SELECT name, organization, sector FROM strategy_portfolios WHERE id = ?",
-                           (st.session_state.loaded_dashboard_id,))
+                           (loaded_id,))
             result = cursor.fetchone()
             conn.close()
 
@@ -2710,7 +2778,7 @@ def strategy_dashboard_ui():
 
     with col_right:
         # Display loaded dashboard or create new
-        if st.session_state.loaded_dashboard_id:
+        if loaded_id:
             st.success(f"✅ Dashboard Loaded: Editing mode")
         else:
             st.info("ℹ️ Create a new dashboard or load an existing one to begin.")
@@ -2739,8 +2807,8 @@ def strategy_dashboard_ui():
 
         # Determine default index based on loaded data
         default_index = 0
-        if st.session_state.loaded_dashboard_id and 'selected_calc_id' in st.session_state:
-            loaded_calc_id = st.session_state.get('selected_calc_id', '')
+        if loaded_id and 'selected_calc_id' in ss:
+            loaded_calc_id = ss.get('selected_calc_id', '')
             if loaded_calc_id:
                 for i, calc_id in enumerate(calc_ids):
                     if calc_id == loaded_calc_id:
@@ -2767,7 +2835,7 @@ def strategy_dashboard_ui():
             selected_calc_id = calc_ids[0] if calc_ids else ""
 
         # Store in session state (not in widget key)
-        st.session_state.selected_calc_id = selected_calc_id
+        ss.selected_calc_id = selected_calc_id
 
         # Load calculation data
         if selected_calc_id:
@@ -2784,8 +2852,8 @@ def strategy_dashboard_ui():
             target_year = loaded['meta'].get('target_year', baseline_year + 8)
 
             # Store in session state for saving
-            st.session_state.current_org_name = current_org_name
-            st.session_state.current_sector = current_sector
+            ss.current_org_name = current_org_name
+            ss.current_sector = current_sector
 
             # Display organization info
             col1, col2, col3 = st.columns(3)
@@ -2795,25 +2863,25 @@ def strategy_dashboard_ui():
 
             # Get calculation data from session state
             calc_data = {}
-            if 'calc' in st.session_state:
-                calc_data = st.session_state.calc
+            if 'calc' in ss:
+                calc_data = ss.calc
 
             # Get same_year flag
             same_year = calc_data.get('same_year', False) if calc_data else False
 
             # Emission values
             baseline_input = loaded.get('baseline_input', {"1": 0.0, "2": 0.0, "3": 0.0})
-            baseline_emission = sum(baseline_input.values())
+            baseline_emission = float(np.fromiter((float(v or 0) for v in baseline_input.values()),
+                                                  dtype=np.float64).sum())
 
             df_rows = pd.DataFrame(loaded['baseline_rows'])
             previous_emission = df_rows['emission'].sum() if not df_rows.empty else 0.0
 
             # Calculate target emissions based on reductions
             reductions_pct = loaded.get('reductions_pct', {"Scope 1": 0.0, "Scope 2": 0.0, "Scope 3": 0.0})
-            total_planned_reduction = sum(
-                baseline_emission * (reductions_pct[scope] / 100)
-                for scope in ["Scope 1", "Scope 2", "Scope 3"]
-            )
+            scope_pct = np.fromiter((float(reductions_pct[scope] or 0) for scope in ["Scope 1", "Scope 2", "Scope 3"]),
+                                    dtype=np.float64)
+            total_planned_reduction = float(baseline_emission * scope_pct.sum() / 100)
 
             # Calculate BAU emissions
             # Get production data
@@ -2825,8 +2893,16 @@ def strategy_dashboard_ui():
                                                                (1 + growth_rate) ** (target_year - baseline_year)))
 
             # BAU = Previous emissions adjusted for production growth
-            production_growth_factor = target_production / previous_year_production if previous_year_production != 0 else 1.0
+            # (float-coerced and finite-guarded so the waterfall never receives NaN/Inf from bad JSON)
+            previous_emission = float(previous_emission or 0.0)
+            if not math.isfinite(previous_emission):  # NaN is truthy, so `or 0.0` lets it through
+                previous_emission = 0.0
+            prev_production = float(previous_year_production or 0.0)
+            tgt_production = float(target_production or 0.0)
+            production_growth_factor = tgt_production / prev_production if prev_production > 0 else 1.0
             total_bau = previous_emission * production_growth_factor
+            if not math.isfinite(total_bau):
+                total_bau = previous_emission
 
             # === 2. MACC Projects Selection ===
             st.subheader("2. Select MACC Projects")
@@ -2840,7 +2916,7 @@ def strategy_dashboard_ui():
                 df_projects = pd.DataFrame(projects)
 
                 # Get default selection from session state
-                default_macc = st.session_state.get('strategy_macc_select', df_projects['name'].tolist())
+                default_macc = ss.get('strategy_macc_select', df_projects['name'].tolist())
 
                 selected_projects = st.multiselect(
                     "Select projects to include in strategy",
@@ -2850,7 +2926,7 @@ def strategy_dashboard_ui():
                 )
 
                 # Store in session state
-                st.session_state.strategy_macc_select = selected_projects
+                ss.strategy_macc_select = selected_projects
 
                 portfolio = df_projects[df_projects['name'].isin(selected_projects)]
                 total_reduction_macc = portfolio['co2_reduction'].sum()
@@ -2869,17 +2945,15 @@ def strategy_dashboard_ui():
                 # === 3. Strategy Analysis ===
                 st.subheader("3. Strategy Analysis")
 
-                # Key Metrics
-                col1, col2, col3, col4 = st.columns(4)
+                # Key Metrics (one columns row for all six)
+                remaining_after_macc = baseline_emission - total_reduction_macc
+                achieved_percentage = (total_reduction_macc / baseline_emission * 100) if baseline_emission > 0 else 0
+
+                col1, col2, col3, col4, col5, col6 = st.columns(6)
                 col1.metric("Baseline Emissions", f"{baseline_emission:,.0f} tCO₂e")
                 col2.metric("Previous Year", f"{previous_emission:,.0f} tCO₂e")
                 col3.metric("Planned Reduction", f"{total_planned_reduction:,.0f} tCO₂e")
                 col4.metric("MACC Achieved", f"{total_reduction_macc:,.0f} tCO₂e")
-
-                remaining_after_macc = baseline_emission - total_reduction_macc
-                achieved_percentage = (total_reduction_macc / baseline_emission * 100) if baseline_emission > 0 else 0
-
-                col5, col6 = st.columns(2)
                 col5.metric("Remaining After MACC", f"{remaining_after_macc:,.0f} tCO₂e")
                 col6.metric("Abatement Achieved", f"{achieved_percentage:.1f}%")
 
@@ -3172,27 +3246,29 @@ def strategy_dashboard_ui():
 
                     st.plotly_chart(fig_macc, use_container_width=True)
 
+                    # Calculate MACC statistics (one mask per sign, reused for the recommendations)
+                    mac_values = macc_portfolio['mac'].to_numpy(dtype=float)
+                    cost_values = macc_portfolio['cost'].to_numpy(dtype=float)
+                    negative_mask = mac_values < 0
+                    positive_mask = mac_values > 0
+
+                    total_abatement = macc_portfolio['co2_reduction'].to_numpy(dtype=float).sum()
+                    avg_mac = mac_values.mean()
+                    total_savings = abs(cost_values[negative_mask].sum())
+                    total_costs = cost_values[positive_mask].sum()
+                    net_cost = total_costs - total_savings
+
                     # Add MACC statistics
                     with st.expander("📈 MACC Statistics", expanded=False):
                         col1, col2, col3, col4 = st.columns(4)
 
-                        # Calculate statistics
-                        total_abatement = macc_portfolio['co2_reduction'].sum()
-                        avg_mac = macc_portfolio['mac'].mean()
-                        negative_cost_projects = macc_portfolio[macc_portfolio['mac'] < 0]
-                        positive_cost_projects = macc_portfolio[macc_portfolio['mac'] > 0]
-
                         col1.metric("Total Abatement", f"{total_abatement:,.0f} tCO₂e")
                         col2.metric("Average MAC", f"₹{avg_mac:,.0f}/ton")
-                        col3.metric("Cost-Saving Projects", len(negative_cost_projects))
-                        col4.metric("Cost-Incurring Projects", len(positive_cost_projects))
+                        col3.metric("Cost-Saving Projects", int(negative_mask.sum()))
+                        col4.metric("Cost-Incurring Projects", int(positive_mask.sum()))
 
                         # Show cost breakdown
                         st.markdown("**Cost Breakdown:**")
-                        total_savings = abs(
-                            negative_cost_projects['cost'].sum()) if not negative_cost_projects.empty else 0
-                        total_costs = positive_cost_projects['cost'].sum() if not positive_cost_projects.empty else 0
-                        net_cost = total_costs - total_savings
 
                         st.write(f"- **Total Cost Savings:** ₹{total_savings:,.0f}")
                         st.write(f"- **Total Implementation Costs:** ₹{total_costs:,.0f}")
@@ -3207,13 +3283,16 @@ def strategy_dashboard_ui():
                     # Recommendations
                     st.subheader("Strategic Recommendations")
 
-                    negative_mac = macc_portfolio[macc_portfolio['mac'] < 0]
+                    negative_mac = macc_portfolio[negative_mask]
                     if not negative_mac.empty:
                         st.success(f"**Cost-Saving Opportunities ({len(negative_mac)} projects):**")
-                        for _, row in negative_mac.iterrows():
-                            saving = abs(row['cost'])
-                            st.write(
-                                f"• **{row['name']}**: Abates {row['co2_reduction']:,.0f} tons, saves ₹{saving:,.0f}")
+                        # One markdown element for the whole list (hard line breaks between items)
+                        st.markdown("  \n".join(
+                            f"• **{name}**: Abates {co2_reduction:,.0f} tons, saves ₹{abs(cost):,.0f}"
+                            for name, co2_reduction, cost in zip(negative_mac['name'].to_numpy(),
+                                                                 negative_mac['co2_reduction'].to_numpy(),
+                                                                 negative_mac['cost'].to_numpy())
+                        ))
 
                     if achieved_percentage >= 50:
                         st.balloons()
@@ -3224,8 +3303,8 @@ def strategy_dashboard_ui():
                         st.warning("Consider adding more projects to meet your reduction goals.")
 
         # Generate Strategy Report Section
-        if st.session_state.strategy_action == "generate":
-            st.markdown("---")
+        if action == "generate":
+            st.divider()
             st.subheader("📊 Strategy Report")
 
             if not saved_calcs:
@@ -3233,32 +3312,37 @@ def strategy_dashboard_ui():
             else:
                 # Create report
                 report_data = {
-                    "Organization": st.session_state.get('current_org_name', 'Not selected'),
-                    "Sector": st.session_state.get('current_sector', 'Not selected'),
+                    "Organization": ss.get('current_org_name', 'Not selected'),
+                    "Sector": ss.get('current_sector', 'Not selected'),
                     "Baseline Emissions (tCO₂e)": f"{baseline_emission:,.0f}" if 'baseline_emission' in locals() else "N/A",
                     "Selected MACC Projects": len(portfolio) if 'portfolio' in locals() else 0,
                     "Total Annual Reduction (tCO₂e)": f"{total_reduction_macc:,.0f}" if 'total_reduction_macc' in locals() else "N/A",
                     "Abatement Achieved (%)": f"{achieved_percentage:.1f}%" if 'achieved_percentage' in locals() else "N/A",
-                    "Report Generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
 
+                # Keep one timestamp per report content so reruns reuse the same file name/payload
+                report_key = hash(tuple(report_data.items()))
+                report_stamp = ss.get('strategy_report_stamp')
+                if not report_stamp or report_stamp[0] != report_key:
+                    report_stamp = ss.strategy_report_stamp = (report_key, datetime.now())
+                generated_at = report_stamp[1]
+                report_data["Report Generated"] = generated_at.strftime("%Y-%m-%d %H:%M:%S")
+
                 # Display report
                 for key, value in report_data.items():
                     st.write(f"**{key}:** {value}")
 
                 # Export options
-                st.markdown("---")
-                st.markdown("#### Export Options")
+                st.markdown("---\n#### Export Options")
 
                 col_exp1, col_exp2 = st.columns(2)
 
                 # CSV Export
-                report_df = pd.DataFrame([report_data])
-                csv = report_df.to_csv(index=False)
+                csv_data = to_csv_text(report_data.keys(), [report_data.values()])
                 col_exp1.download_button(
                     label="📥 Download as CSV",
-                    data=csv,
-                    file_name=f"strategy_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    data=csv_data,
+                    file_name=f"strategy_report_{generated_at.strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv",
                     key="download_csv_report"
                 )
@@ -3269,7 +3353,7 @@ def strategy_dashboard_ui():
 
                 # Close report
                 if st.button("Close Report", key="btn_close_report"):
-                    st.session_state.strategy_action = None
+                    ss.strategy_action = None
                     st.rerun()
 
 
@@ -3279,6 +3363,461 @@ def _safe_float(s):
         return float(str(s).strip()) if str(s).strip() != "" else 0.0
     except:
         return 0.0
+
+
+def _parse_life_span(value, default=10):
+    """Life span as a whole number of years (>= 1); missing or invalid values give the default"""
+    try:
+        years = int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+    return years if years >= 1 else default
+
+
+def to_csv_text(header, rows):
+    """CSV text for a header + rows, written straight through csv.writer (no DataFrame)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=256)
+def project_id_prefix(organization, entity_name, unit_name, project_name, target_year, project_owner):
+    """Project ID prefix ORG-EN-UN-PRJ-2025-PO from the project details (memoised per input tuple)"""
+    # Use first 2-3 letters of each component; slice first, then upper-case the joined codes in one call
+    org_code = organization[:3] if organization else "ORG"
+    entity_code = entity_name[:2] if entity_name else "EN"
+    unit_code = unit_name[:2] if unit_name else "UN"
+    project_code = project_name[:3] if project_name else "PRJ"
+    owner_code = project_owner[:2] if project_owner else "PO"
+
+    head = f"{org_code}-{entity_code}-{unit_code}-{project_code}".upper()
+    return f"{head}-{target_year}-{owner_code.upper()}"
+
+
+def rows_to_json(rows):
+    """Serialize table rows for storage (orjson; numpy values as numbers, anything else via str)"""
+    # orjson writes NaN/Infinity as null, which loads back as a missing value; rows holding one keep
+    # the stdlib NaN/Infinity literals instead (parse_json_safely reads those back as floats)
+    if any(isinstance(value, float) and not math.isfinite(value)
+           for row in rows if isinstance(row, dict) for value in row.values()):
+        return json.dumps(rows, default=str)
+    return orjson.dumps(rows, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def rows_from_json(text):
+    """Stored table rows back from JSON (orjson; the stdlib for the NaN/Infinity literals orjson rejects)"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+
+def _absolute_totals(ef, before_after):
+    """Before/after totals from an (n, 2) [before, after] array in one product: Σ(quantity × EF)"""
+    before, after = ef @ before_after
+    return float(before), float(after)
+
+
+def _specific_totals(ef, before_after, amp_before, amp_after):
+    """Before/after totals from an (n, 2) [before, after] array in one product: AMP × Σ(specific quantity × EF)"""
+    before, after = ef @ before_after
+    return float(amp_before * before), float(amp_after * after)
+
+
+def _fixed_output_totals(ef, amp_before, amp_after):
+    """Specific-method outputs are fixed at 1.0 per unit of AMP: AMP × ΣEF"""
+    ef_sum = float(ef.sum())
+    return amp_before * ef_sum, amp_after * ef_sum
+
+
+def row_columns(rows, keys):
+    """(len(rows), len(keys)) float64 array of the given row fields, read in one pass (missing -> 0.0)"""
+    # float64 on purpose: float32 totals drift in the displayed 2nd decimal at plant-scale magnitudes
+    values = np.array([[row.get(key, 0.0) for key in keys] for row in rows], dtype=np.float64)
+    return values.reshape(len(rows), len(keys))
+
+
+def section_emission_totals(rows, is_absolute, amp_before=1.0, amp_after=1.0, fixed_output=False, values=None):
+    """(before, after) emissions of one input/output table: quantity × EF, AMP-scaled in specific mode"""
+    # values: a row_columns(rows, CO2_VALUE_FIELDS) array kept from when the rows last changed
+    if values is None:
+        values = row_columns(rows, CO2_VALUE_FIELDS)
+    # Pick the kernel once per table; none of them branches per row. The before/after columns sit
+    # side by side in CO2_VALUE_FIELDS, so each pair is a ready-made (n, 2) slice for one ef @ pair
+    if is_absolute:
+        return _absolute_totals(values[:, 0], values[:, 1:3])
+    if fixed_output:
+        return _fixed_output_totals(values[:, 0], amp_before, amp_after)
+    return _specific_totals(values[:, 0], values[:, 3:5], amp_before, amp_after)
+
+
+@lru_cache(maxsize=512)
+def tracking_emissions(input_values, output_values, amp_value, is_absolute, input_ef, output_ef):
+    """(input, output, net) emissions of one tracking year, memoised on its (tuple) inputs"""
+    input_ef = np.asarray(input_ef, dtype=np.float64)
+    output_ef = np.asarray(output_ef, dtype=np.float64)
+    total_input = float(np.dot(np.asarray(input_values, dtype=np.float64), input_ef))
+    if is_absolute:
+        total_output = float(np.dot(np.asarray(output_values, dtype=np.float64), output_ef))
+    else:
+        # Specific mode: inputs scale with AMP, outputs are fixed at 1.0 per unit of AMP
+        total_input *= amp_value
+        total_output = float(amp_value * output_ef.sum())
+    return total_input, total_output, total_input - total_output
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_emission_analysis_fig(input_before, input_after, output_before, output_after,
+                                net_before, net_after, sp_net_before, sp_net_after, co2_reduction):
+    """Before/After bar chart of the CO2 emission results (cached on the plotted numbers)"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        name='Before',
+        x=['Input CO₂', 'Output CO₂', 'Net CO₂', 'Sp.Net'],
+        y=[input_before, output_before, net_before, sp_net_before * 10000],
+        marker_color='blue'
+    ))
+
+    fig.add_trace(go.Bar(
+        name='After',
+        x=['Input CO₂', 'Output CO₂', 'Net CO₂', 'Sp.Net'],
+        y=[input_after, output_after, net_after, sp_net_after * 10000],
+        marker_color='green'
+    ))
+
+    fig.add_trace(go.Scatter(
+        name='CO₂ Reduction',
+        x=['CO₂ Reduction'],
+        y=[co2_reduction],
+        mode='markers+text',
+        marker=dict(
+            size=15,
+            color='red',
+            symbol='diamond'
+        ),
+        text=[f"{co2_reduction:,.0f}"],
+        textposition='top center',
+        showlegend=True
+    ))
+
+    fig.update_layout(
+        title='CO₂ Emissions Analysis with Sp.Net and Reduction',
+        barmode='group',
+        yaxis_title='tCO₂e (Sp.Net × 10,000)',
+        template='plotly_white',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        annotations=[
+            dict(
+                x='Sp.Net',
+                y=sp_net_before * 10000,
+                text=f"Sp.Net_Before: {sp_net_before:.6f}",
+                showarrow=True,
+                arrowhead=2,
+                ax=0,
+                ay=-40
+            ),
+            dict(
+                x='Sp.Net',
+                y=sp_net_after * 10000,
+                text=f"Sp.Net_After: {sp_net_after:.6f}",
+                showarrow=True,
+                arrowhead=2,
+                ax=0,
+                ay=40
+            )
+        ]
+    )
+    return fig
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_reduction_components_fig(is_absolute, sp_net_before, sp_net_after, primary_output_after, amp_after):
+    """Sp.Net Before/After plus the scaling quantity behind the CO2 reduction (cached on the plotted numbers)"""
+    fig_reduction = go.Figure()
+
+    if is_absolute:
+        fig_reduction.add_trace(go.Bar(
+            name='Sp.Net_Before',
+            x=['Sp.Net Before'],
+            y=[sp_net_before],
+            marker_color='blue',
+            text=[f"{sp_net_before:.6f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.add_trace(go.Bar(
+            name='Sp.Net_After',
+            x=['Sp.Net After'],
+            y=[sp_net_after],
+            marker_color='green',
+            text=[f"{sp_net_after:.6f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.add_trace(go.Bar(
+            name='Primary Output After',
+            x=['Primary Output'],
+            y=[primary_output_after],
+            marker_color='orange',
+            text=[f"{primary_output_after:,.0f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.update_layout(
+            title='CO₂ Reduction Calculation Components (Absolute Method)',
+            yaxis_title='Value',
+            template='plotly_white',
+            showlegend=True
+        )
+
+    else:
+        fig_reduction.add_trace(go.Bar(
+            name='Sp.Net_Before',
+            x=['Sp.Net Before'],
+            y=[sp_net_before],
+            marker_color='blue',
+            text=[f"{sp_net_before:.6f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.add_trace(go.Bar(
+            name='Sp.Net_After',
+            x=['Sp.Net After'],
+            y=[sp_net_after],
+            marker_color='green',
+            text=[f"{sp_net_after:.6f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.add_trace(go.Bar(
+            name='AMP After',
+            x=['AMP'],
+            y=[amp_after],
+            marker_color='purple',
+            text=[f"{amp_after:,.0f}"],
+            textposition='auto'
+        ))
+
+        fig_reduction.update_layout(
+            title='CO₂ Reduction Calculation Components (Specific Method)',
+            yaxis_title='Value',
+            template='plotly_white',
+            showlegend=True
+        )
+    return fig_reduction
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_tracking_trend_fig(years_with_data, actual_reductions, baseline_reduction):
+    """CO₂ Reduction Trend line (Base + tracked years) with the baseline as a dashed line"""
+    years_for_chart = ["Base"] + [f"Year {y}" for y in years_with_data]
+    reduction_values = np.concatenate(([baseline_reduction], actual_reductions))
+
+    fig = go.Figure()
+
+    # Add line for baseline
+    fig.add_trace(go.Scatter(
+        x=years_for_chart,
+        y=reduction_values,
+        mode='lines+markers+text',
+        name='CO₂ Reduction',
+        line=dict(color='blue', width=2),
+        marker=dict(size=10),
+        text=[f"{val:,.0f}" for val in reduction_values],
+        textposition='top center'
+    ))
+
+    # Add horizontal line for baseline
+    fig.add_hline(
+        y=baseline_reduction,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text=f"Baseline: {baseline_reduction:,.0f}",
+        annotation_position="bottom right"
+    )
+
+    fig.update_layout(
+        title="CO₂ Reduction Trend",
+        xaxis_title="Period",
+        yaxis_title="CO₂ Reduction (tCO₂e)",
+        template="plotly_white",
+        showlegend=True
+    )
+    return fig
+
+
+def reuse_figure(state_key, builder, *args):
+    """Figure from the previous rerun when its inputs are unchanged, else builder(*args)"""
+    stored = st.session_state.get(state_key)
+    if stored is None or stored[0] != args:
+        stored = st.session_state[state_key] = (args, builder(*args))
+    return stored[1]
+
+
+# AMP units offered in Specific mode, with their selectbox positions
+AMP_UOMS = ("t/tp", "kl/tp", "kWh/tp", "kg/tp", "tons/tp")
+AMP_UOM_INDEX = {uom: i for i, uom in enumerate(AMP_UOMS)}
+
+# Defaults for a new (unsaved) CO2 project; use _new_co2_project() for a fresh copy
+_BLANK_CO2_PROJECT = {
+    'project_code': '',
+    'organization': '',
+    'entity_name': '',
+    'unit_name': '',
+    'project_name': '',
+    'base_year': '',
+    'target_year': '',
+    'implementation_date': '',
+    'life_span': 10,
+    'project_owner': '',
+    'amp_before': 0.0,
+    'amp_after': 0.0,
+    'amp_uom': AMP_UOMS[0],
+    'calculation_method': 'absolute',
+    'is_loaded_from_db': False,
+    'primary_output_before': 0.0,
+    'primary_output_after': 0.0,
+}
+
+
+def _new_co2_project():
+    """Fresh blank CO2 project state (row lists are new objects each call)"""
+    return {**_BLANK_CO2_PROJECT, 'input_data': [{}], 'output_data': [{}], 'costing_data': [{}]}
+
+
+# Fields that must be filled before a CO2 project can be saved
+CO2_REQUIRED_FIELDS = (
+    ('project_name', 'Project Name'),
+    ('organization', 'Organization'),
+    ('entity_name', 'Entity Name'),
+    ('unit_name', 'Unit Name'),
+    ('target_year', 'Target Year'),
+    ('project_owner', 'Project Owner'),
+)
+
+# --- Field aliases accepted when loading saved CO2 project rows ---
+# Earlier aliases take priority when a row carries more than one of them.
+CO2_FIELD_ALIASES = {
+    'material': ['material', 'Material', 'name', 'Name'],
+    'uom': ['uom', 'UOM', 'unit', 'Unit'],
+    'ef': ['ef', 'Emission Factor (tCO₂e/unit)', 'emission_factor', 'emission'],
+    'abs_before': ['abs_before', 'Absolute Before', 'abs_before_value', 'before_abs', 'Abs Actual-Before'],
+    'abs_after': ['abs_after', 'Absolute After', 'abs_after_value', 'after_abs', 'Abs Planned-After'],
+    'spec_before': ['spec_before', 'Specific Before', 'spec_before_value', 'before_spec', 'Spec Actual-Before'],
+    'spec_after': ['spec_after', 'Specific After', 'spec_after_value', 'after_spec', 'Spec Planned-After']
+}
+CO2_NUMERIC_FIELDS = frozenset({'ef', 'abs_before', 'abs_after', 'spec_before', 'spec_after'})
+# Columns held by the table editors; only the current method's values are shown
+CO2_TABLE_FIELDS = ('material', 'uom', 'ef', 'abs_before', 'abs_after', 'spec_before', 'spec_after')
+CO2_COSTING_FIELDS = ('material', 'uom', 'abs_before', 'abs_after', 'spec_before', 'spec_after')
+# Column order of the numeric arrays the emission totals are computed from
+CO2_VALUE_FIELDS = ('ef', 'abs_before', 'abs_after', 'spec_before', 'spec_after')
+# alias -> (standard field, priority)
+CO2_ALIAS_LOOKUP = {alias: (field, priority)
+                    for field, aliases in CO2_FIELD_ALIASES.items()
+                    for priority, alias in enumerate(aliases)}
+
+
+# --- SQL for the CO2 Project Calculator (module-level so sqlite3's statement cache always hits) ---
+SQL_FUEL_ORGANIZATIONS = (
+    "SELECT DISTINCT org_name FROM calculations WHERE org_name IS NOT NULL AND org_name != '' ORDER BY org_name")
+SQL_CO2_PROJECT_OPTIONS = (
+    "SELECT project_code, organization, entity_name, unit_name, project_name, base_year, target_year, "
+    "project_owner, calculation_method FROM projects ORDER BY created_at DESC")
+SQL_LOAD_CO2_PROJECT = """
+    SELECT project_code, organization, entity_name, unit_name, project_name, base_year, target_year,
+           implementation_date, life_span, project_owner, input_data, output_data, costing_data,
+           amp_before, amp_after, amp_uom, calculation_method
+    FROM projects WHERE project_code = ?
+"""
+# Upsert on project_code only: a clash on the UNIQUE project_name index raises
+# IntegrityError (INSERT OR REPLACE would silently delete the other project).
+# updated_at carries milliseconds: it is fetch_project_state's cache key, and two
+# saves within one second must not share a key
+SQL_SAVE_CO2_PROJECT = """
+    INSERT INTO projects
+    (project_code, organization, entity_name, unit_name, project_name, base_year, target_year,
+     implementation_date, life_span, project_owner, input_data, output_data, costing_data,
+     amp_before, amp_after, amp_uom, calculation_method, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT(project_code) DO UPDATE SET
+        organization = excluded.organization,
+        entity_name = excluded.entity_name,
+        unit_name = excluded.unit_name,
+        project_name = excluded.project_name,
+        base_year = excluded.base_year,
+        target_year = excluded.target_year,
+        implementation_date = excluded.implementation_date,
+        life_span = excluded.life_span,
+        project_owner = excluded.project_owner,
+        input_data = excluded.input_data,
+        output_data = excluded.output_data,
+        costing_data = excluded.costing_data,
+        amp_before = excluded.amp_before,
+        amp_after = excluded.amp_after,
+        amp_uom = excluded.amp_uom,
+        calculation_method = excluded.calculation_method,
+        updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+"""
+SQL_SAVE_PROJECT_ACTUAL = """
+    INSERT INTO project_actuals
+    (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(project_code, section_type, row_index, year_number) DO UPDATE SET
+        material_name = excluded.material_name,
+        absolute_value = excluded.absolute_value,
+        specific_value = excluded.specific_value
+"""
+SQL_SAVE_AMP_ACTUAL = """
+    INSERT INTO amp_actuals_tracking (project_code, year_number, amp_value)
+    VALUES (?, ?, ?)
+    ON CONFLICT(project_code, year_number) DO UPDATE SET amp_value = excluded.amp_value
+"""
+SQL_DELETE_CO2_PROJECT = (
+    "DELETE FROM project_actuals WHERE project_code = ?",
+    "DELETE FROM amp_actuals_tracking WHERE project_code = ?",
+    "DELETE FROM projects WHERE project_code = ?",
+)
+
+
+# --- Cached lookups for the CO2 Project Calculator ---
+# Errors propagate (so a failed query is not cached); callers catch and warn.
+# Call .clear() after writing to the underlying table.
+@st.cache_data(ttl=60, show_spinner=False)
+def get_fuel_organizations(db_path):
+    """Return (organization names, {name: position}) from the Fuel & Energy Calculator database"""
+    cursor = get_conn(db_path).cursor()
+    cursor.execute(SQL_FUEL_ORGANIZATIONS)
+    organizations = [row[0] for row in cursor.fetchall()]
+    return organizations, {org: i for i, org in enumerate(organizations)}
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_co2_project_options(db_path):
+    """Return (display_names, {display_name: project info}) for the project dropdown"""
+    projects_df = pd.read_sql_query(SQL_CO2_PROJECT_OPTIONS, get_conn(db_path))
+
+    # Create display names for each project (vectorised string concat)
+    text = projects_df.astype(str)
+    display_names = (
+        text['organization'].str.cat([text['entity_name'], text['unit_name'], text['project_name']], sep=' - ')
+        + ' (' + text['target_year'] + ') - ' + text['project_owner']
+    ).tolist()
+    full_info = projects_df[['project_code', 'organization', 'entity_name', 'unit_name', 'project_name',
+                             'target_year', 'project_owner', 'calculation_method']].to_dict(orient='records')
+    return display_names, dict(zip(display_names, full_info))
+
+
 def co2_project_calculator_ui():
     st.header("📊 Project CO₂ Emission Calculator with Actuals Tracking")
 
@@ -3287,28 +3826,7 @@ def co2_project_calculator_ui():
 
     # Initialize session state
     if 'co2_project' not in st.session_state:
-        st.session_state.co2_project = {
-            'project_code': '',
-            'organization': '',
-            'entity_name': '',
-            'unit_name': '',
-            'project_name': '',
-            'base_year': '',
-            'target_year': '',
-            'implementation_date': '',
-            'life_span': '10',
-            'project_owner': '',
-            'input_data': [{}],
-            'output_data': [{}],
-            'costing_data': [{}],
-            'amp_before': 0.0,
-            'amp_after': 0.0,
-            'amp_uom': 't/tp',
-            'calculation_method': 'absolute',
-            'is_loaded_from_db': False,
-            'primary_output_before': 0.0,
-            'primary_output_after': 0.0,
-        }
+        st.session_state.co2_project = _new_co2_project()
 
     project = st.session_state.co2_project
 
@@ -3319,96 +3837,58 @@ def co2_project_calculator_ui():
             return default_value
         try:
             if isinstance(json_str, str):
-                return json.loads(json_str)
+                return rows_from_json(json_str)
             else:
                 return json_str
         except (json.JSONDecodeError, TypeError):
             return default_value
 
-    def normalize_data_row(row):
-        """Normalize data row to have consistent field names"""
-        if not isinstance(row, dict):
-            return {}
-
-        normalized = {}
-
-        field_mapping = {
-            'material': ['material', 'Material', 'name', 'Name'],
-            'uom': ['uom', 'UOM', 'unit', 'Unit'],
-            'ef': ['ef', 'Emission Factor (tCO₂e/unit)', 'emission_factor', 'emission'],
-            'abs_before': ['abs_before', 'Absolute Before', 'abs_before_value', 'before_abs', 'Abs Actual-Before'],
-            'abs_after': ['abs_after', 'Absolute After', 'abs_after_value', 'after_abs', 'Abs Planned-After'],
-            'spec_before': ['spec_before', 'Specific Before', 'spec_before_value', 'before_spec', 'Spec Actual-Before'],
-            'spec_after': ['spec_after', 'Specific After', 'spec_after_value', 'after_spec', 'Spec Planned-After']
-        }
-
-        for standard_field, possible_names in field_mapping.items():
-            for name in possible_names:
-                if name in row and row[name] is not None:
+    def normalize_data_rows(rows, specific_output=False):
+        """Normalize a list of data rows to consistent field names"""
+        normalized_rows = []
+        for row in rows:
+            # Single pass over the row keys; keep the highest-priority alias per field
+            found = {}
+            for name, value in (row.items() if isinstance(row, dict) else ()):
+                hit = CO2_ALIAS_LOOKUP.get(name)
+                if hit is None or value is None:
+                    continue
+                standard_field, priority = hit
+                if standard_field not in found or priority < found[standard_field][0]:
+                    found[standard_field] = (priority, value)
+
+            # Fields missing from a row stay missing (callers rely on .get() defaults)
+            normalized = {}
+            for standard_field in CO2_FIELD_ALIASES:
+                if standard_field not in found:
+                    continue
+                value = found[standard_field][1]
+                if standard_field in CO2_NUMERIC_FIELDS:
                     try:
-                        if standard_field in ['ef', 'abs_before', 'abs_after', 'spec_before', 'spec_after']:
-                            if isinstance(row[name], (int, float)):
-                                normalized[standard_field] = float(row[name])
-                            elif isinstance(row[name], str):
-                                try:
-                                    normalized[standard_field] = float(row[name])
-                                except ValueError:
-                                    normalized[standard_field] = 0.0
-                            else:
-                                normalized[standard_field] = 0.0
-                        else:
-                            normalized[standard_field] = str(row[name])
-                        break
+                        normalized[standard_field] = float(value)
                     except (ValueError, TypeError):
-                        normalized[standard_field] = 0.0 if standard_field in ['ef', 'abs_before', 'abs_after',
-                                                                               'spec_before', 'spec_after'] else ''
-        return normalized
+                        normalized[standard_field] = 0.0
+                else:
+                    normalized[standard_field] = str(value)
+            # Specific-method outputs are fixed at 1.0 (same rule as enforce_specific_rules)
+            if specific_output:
+                normalized.update(abs_before=1.0, spec_before=1.0, spec_after=1.0)
+            normalized_rows.append(normalized)
+        return normalized_rows
 
     def enforce_specific_rules(data, calculation_method, data_type='output'):
         """Enforce rules for specific calculations"""
         if calculation_method == 'specific' and data_type == 'output':
-            for row in data:
-                row['abs_before'] = 1.0
-                row['spec_before'] = 1.0
-                row['spec_after'] = 1.0
+            fixed = {'abs_before': 1.0, 'spec_before': 1.0, 'spec_after': 1.0}
+            # Changed rows come back as a new list (never rewritten in place), so arrays cached
+            # against the old list are not mistaken for the new values
+            if any(row.get(field) != value for row in data for field, value in fixed.items()):
+                return [{**row, **fixed} for row in data]
         return data
 
-    def calculate_tracking_emissions(input_values, output_values, amp_value, calculation_method, input_ef_list,
-                                     output_ef_list, is_output_specific=False):
-        """Calculate emissions for tracking based on actual values"""
-        total_input_emission = 0.0
-        total_output_emission = 0.0
-
-        if calculation_method == 'absolute':
-            for i, (input_val, input_ef) in enumerate(zip(input_values, input_ef_list)):
-                total_input_emission += input_val * input_ef
-
-            for i, (output_val, output_ef) in enumerate(zip(output_values, output_ef_list)):
-                total_output_emission += output_val * output_ef
-
-        else:  # specific
-            for i, (input_val, input_ef) in enumerate(zip(input_values, input_ef_list)):
-                total_input_emission += (amp_value * input_val) * input_ef
-
-            for i, (output_val, output_ef) in enumerate(zip(output_values, output_ef_list)):
-                if is_output_specific:
-                    output_val = 1.0
-                total_output_emission += (amp_value * output_val) * output_ef
-
-        net_emission = total_input_emission - total_output_emission
-        return total_input_emission, total_output_emission, net_emission
-
     def generate_project_id(organization, entity_name, unit_name, project_name, target_year, project_owner):
         """Generate a meaningful Project ID based on project details"""
-        # Use first 2-3 letters of each component
-        org_code = organization[:3].upper() if organization else "ORG"
-        entity_code = entity_name[:2].upper() if entity_name else "EN"
-        unit_code = unit_name[:2].upper() if unit_name else "UN"
-        project_code = project_name[:3].upper() if project_name else "PRJ"
-        owner_code = project_owner[:2].upper() if project_owner else "PO"
-
-        # Generate ID: ORG-EN-UN-PRJ-2025-PO-XXXX
-        base_id = f"{org_code}-{entity_code}-{unit_code}-{project_code}-{target_year}-{owner_code}"
+        base_id = project_id_prefix(organization, entity_name, unit_name, project_name, target_year, project_owner)
 
         # Add unique suffix
         unique_suffix = uuid.uuid4().hex[:4].upper()
@@ -3417,272 +3897,223 @@ def co2_project_calculator_ui():
 
     # --- Get Organizations from Fuel & Energy Calculator ---
     def get_organizations_from_fuel_db():
-        """Fetch organizations from Fuel & Energy Calculator database"""
+        """Fetch organizations from Fuel & Energy Calculator database (cached)"""
         try:
-            conn = sqlite3.connect(FUEL_DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT DISTINCT org_name FROM calculations WHERE org_name IS NOT NULL AND org_name != '' ORDER BY org_name")
-            organizations = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            return organizations
+            return get_fuel_organizations(FUEL_DB_PATH)
         except Exception as e:
             st.warning(f"Could not load organizations: {e}")
-            return []
+            return [], {}
 
     # --- Load Projects for Dropdown ---
     def load_projects_for_dropdown():
-        """Load projects from database and format for dropdown"""
+        """Load projects from database and format for dropdown (cached)"""
         try:
-            conn = sqlite3.connect(CO2_DB_PATH)
-            projects_df = pd.read_sql_query(
-                "SELECT project_code, organization, entity_name, unit_name, project_name, base_year, target_year, project_owner, calculation_method FROM projects ORDER BY created_at DESC",
-                conn
-            )
-            conn.close()
-
-            # Create display names for each project
-            projects_df['display_name'] = projects_df.apply(
-                lambda
-                    row: f"{row['organization']} - {row['entity_name']} - {row['unit_name']} - {row['project_name']} ({row['target_year']}) - {row['project_owner']}",
-                axis=1
-            )
-            projects_df['full_info'] = projects_df.apply(
-                lambda row: {
-                    'project_code': row['project_code'],
-                    'organization': row['organization'],
-                    'entity_name': row['entity_name'],
-                    'unit_name': row['unit_name'],
-                    'project_name': row['project_name'],
-                    'target_year': row['target_year'],
-                    'project_owner': row['project_owner'],
-                    'calculation_method': row['calculation_method']
-                },
-                axis=1
-            )
-            return projects_df
+            return load_co2_project_options(CO2_DB_PATH)
         except Exception as e:
             st.warning(f"Could not load projects: {e}")
-            return pd.DataFrame(columns=['display_name', 'full_info'])
+            return [], {}
 
     # Get organizations for dropdown
-    organizations_list = get_organizations_from_fuel_db()
+    organizations_list, organization_index = get_organizations_from_fuel_db()
 
     # --- Control Buttons ---
-    st.subheader("Project Management")
-    col1, col2, col3, col4, col5 = st.columns([1.5, 1.5, 1.5, 1.5, 1.5])
+    @st.fragment
+    def project_management_panel():
+        """Project bar (New/Search/Load/Save/Delete); reruns on its own, mutations rerun the whole app"""
+        project = st.session_state.co2_project
 
-    if col1.button("🆕 New", key="co2_new", use_container_width=True):
-        st.session_state.co2_project = {
-            'project_code': '',
-            'organization': '',
-            'entity_name': '',
-            'unit_name': '',
-            'project_name': '',
-            'base_year': '',
-            'target_year': '',
-            'implementation_date': '',
-            'life_span': '10',
-            'project_owner': '',
-            'input_data': [{}],
-            'output_data': [{}],
-            'costing_data': [{}],
-            'amp_before': 0.0,
-            'amp_after': 0.0,
-            'amp_uom': 't/tp',
-            'calculation_method': 'absolute',
-            'is_loaded_from_db': False,
-            'primary_output_before': 0.0,
-            'primary_output_after': 0.0,
-        }
-        st.success("New project created")
-        st.rerun()
-
-    # Load project list with search functionality
-    projects_df = load_projects_for_dropdown()
-
-    # Create a selectbox with search functionality
-    project_options = [""] + projects_df['display_name'].tolist()
-    project_data_dict = {display: data for display, data in zip(projects_df['display_name'], projects_df['full_info'])}
-
-    search_col1, search_col2 = st.columns([3, 1])
-
-    with search_col1:
-        selected_display_name = st.selectbox(
-            "Search and Select Project",
-            options=project_options,
-            key="co2_load_select",
-            help="Type to search projects by organization, entity, unit, project name, target year, or owner"
-        )
+        st.subheader("Project Management")
+        col1, col2, col3, col4, col5 = st.columns([1.5, 1.5, 1.5, 1.5, 1.5])
 
-    with search_col2:
-        search_term = st.text_input("Quick Search", placeholder="Search...", key="project_search")
-
-        # Filter options based on search term
-        if search_term:
-            filtered_options = [opt for opt in project_options if search_term.lower() in opt.lower()]
-            if filtered_options:
-                selected_display_name = st.selectbox(
-                    "Filtered Results",
-                    options=filtered_options,
-                    key="co2_load_filtered",
-                    help="Select from filtered results"
-                )
-            else:
-                st.info("No matching projects found")
-
-    # Get the project data for the selected display name
-    selected_project_data = project_data_dict.get(selected_display_name) if selected_display_name else None
-
-    if col3.button("📂 Load", key="co2_load_btn", use_container_width=True):
-        if selected_display_name and selected_project_data:
-            try:
-                project_code = selected_project_data['project_code']
-                conn = sqlite3.connect(CO2_DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM projects WHERE project_code = ?", (project_code,))
-                row = cursor.fetchone()
-
-                if row:
-                    cols = [description[0] for description in cursor.description]
-                    data = dict(zip(cols, row))
-
-                    calc_method = data.get('calculation_method', 'absolute')
+        if col1.button("🆕 New", key="co2_new", use_container_width=True):
+            st.session_state.co2_project = _new_co2_project()
+            st.success("New project created")
+            st.rerun()
 
-                    input_data = parse_json_safely(data.get('input_data'), [{}])
-                    output_data = parse_json_safely(data.get('output_data'), [{}])
-                    costing_data = parse_json_safely(data.get('costing_data'), [{}])
+        # Load project list with search functionality
+        project_display_names, project_data_dict = load_projects_for_dropdown()
 
-                    input_data = [normalize_data_row(row) for row in input_data]
-                    output_data = [normalize_data_row(row) for row in output_data]
-                    costing_data = [normalize_data_row(row) for row in costing_data]
+        # Create a selectbox with search functionality
+        project_options = [""] + project_display_names
 
-                    if calc_method == 'specific':
-                        output_data = enforce_specific_rules(output_data, 'specific', 'output')
+        search_col1, search_col2 = st.columns([3, 1])
 
-                    primary_output_before = 0.0
-                    primary_output_after = 0.0
-                    if output_data and len(output_data) > 0:
-                        if calc_method == 'absolute':
-                            primary_output_before = output_data[0].get('abs_before', 0.0)
-                            primary_output_after = output_data[0].get('abs_after', 0.0)
-                        else:
-                            primary_output_before = output_data[0].get('spec_before', 1.0)
-                            primary_output_after = output_data[0].get('spec_after', 1.0)
-
-                    new_project = {
-                        'project_code': data.get('project_code', ''),
-                        'organization': data.get('organization', ''),
-                        'entity_name': data.get('entity_name', ''),
-                        'unit_name': data.get('unit_name', ''),
-                        'project_name': data.get('project_name', ''),
-                        'base_year': str(data.get('base_year', '')),
-                        'target_year': str(data.get('target_year', '')),
-                        'implementation_date': str(data.get('implementation_date', '')),
-                        'life_span': str(data.get('life_span', '10')),
-                        'project_owner': data.get('project_owner', ''),
-                        'input_data': input_data,
-                        'output_data': output_data,
-                        'costing_data': costing_data,
-                        'amp_before': float(data.get('amp_before', 0.0)),
-                        'amp_after': float(data.get('amp_after', 0.0)),
-                        'amp_uom': data.get('amp_uom', 't/tp'),
-                        'calculation_method': calc_method,
-                        'is_loaded_from_db': True,
-                        'primary_output_before': primary_output_before,
-                        'primary_output_after': primary_output_after,
-                    }
+        with search_col1:
+            selected_display_name = st.selectbox(
+                "Search and Select Project",
+                options=project_options,
+                key="co2_load_select",
+                help="Type to search projects by organization, entity, unit, project name, target year, or owner"
+            )
 
-                    st.session_state.co2_project = new_project
-                    st.success(f"✅ Successfully loaded: {selected_display_name}")
-                    st.rerun()
+        with search_col2:
+            search_term = st.text_input("Quick Search", placeholder="Search...", key="project_search")
+
+            # Filter options based on search term
+            if search_term:
+                filtered_options = [opt for opt in project_options if search_term.lower() in opt.lower()]
+                if filtered_options:
+                    selected_display_name = st.selectbox(
+                        "Filtered Results",
+                        options=filtered_options,
+                        key="co2_load_filtered",
+                        help="Select from filtered results"
+                    )
                 else:
-                    st.error("❌ Project not found in database")
+                    st.info("No matching projects found")
 
-                conn.close()
-            except Exception as e:
-                st.error(f"❌ Load error: {str(e)}")
-        else:
-            st.warning("⚠️ Please select a project to load")
-
-    if col4.button("💾 Save", key="co2_save", use_container_width=True):
-        if not project['project_name'].strip():
-            st.error("❌ Project Name is required")
-        elif not project['organization'].strip():
-            st.error("❌ Organization is required")
-        elif not project['entity_name'].strip():
-            st.error("❌ Entity Name is required")
-        elif not project['unit_name'].strip():
-            st.error("❌ Unit Name is required")
-        elif not project['target_year'].strip():
-            st.error("❌ Target Year is required")
-        elif not project['project_owner'].strip():
-            st.error("❌ Project Owner is required")
-        else:
-            if project['calculation_method'] == 'specific':
-                project['output_data'] = enforce_specific_rules(project['output_data'], 'specific', 'output')
-
-            if project['output_data'] and len(project['output_data']) > 0:
-                if project['calculation_method'] == 'absolute':
-                    project['primary_output_before'] = project['output_data'][0].get('abs_before', 0.0)
-                    project['primary_output_after'] = project['output_data'][0].get('abs_after', 0.0)
-                else:
-                    project['primary_output_before'] = project['output_data'][0].get('spec_before', 1.0)
-                    project['primary_output_after'] = project['output_data'][0].get('spec_after', 1.0)
-
-            # Generate new Project ID if needed or update existing
-            if not project['project_code'] or not project.get('is_loaded_from_db', False):
-                project['project_code'] = generate_project_id(
-                    project['organization'],
-                    project['entity_name'],
-                    project['unit_name'],
-                    project['project_name'],
-                    project['target_year'],
-                    project['project_owner']
-                )
+        # Get the project data for the selected display name
+        selected_project_data = project_data_dict.get(selected_display_name) if selected_display_name else None
 
+        def loaded_widget_state(loaded):
+            """Session-state values for the keyed project widgets; a keyed widget ignores a changed value="""
             try:
-                conn = sqlite3.connect(CO2_DB_PATH)
-                c = conn.cursor()
+                impl_date = datetime.fromisoformat(loaded['implementation_date']).date()
+            except (TypeError, ValueError):
+                impl_date = datetime.today().date()
+            organization = loaded['organization']
+            if organizations_list:
+                org_state = {'co2_org_dropdown': organization if organization in organization_index else ""}
+            else:
+                org_state = {'co2_org_text': organization}
+            return {
+                **org_state,
+                'co2_entity': loaded['entity_name'],
+                'co2_unit': loaded['unit_name'],
+                'co2_proj_name': loaded['project_name'],
+                'co2_base_year': loaded['base_year'],
+                'co2_target_year': loaded['target_year'],
+                'co2_impl_date_picker': impl_date,
+                'co2_life_span': loaded['life_span'],
+                'co2_owner': loaded['project_owner'],
+                'co2_calc_method_display': loaded['calculation_method'],
+                'co2_amp_before': loaded['amp_before'],
+                'co2_amp_after': loaded['amp_after'],
+                'co2_amp_uom': loaded['amp_uom'] if loaded['amp_uom'] in AMP_UOM_INDEX else AMP_UOMS[0],
+            }
 
-                input_json = json.dumps(project['input_data'], default=str)
-                output_json = json.dumps(project['output_data'], default=str)
-                costing_json = json.dumps(project['costing_data'], default=str)
+        if col3.button("📂 Load", key="co2_load_btn", use_container_width=True):
+            if selected_display_name and selected_project_data:
+                try:
+                    project_code = selected_project_data['project_code']
+                    conn = get_conn(CO2_DB_PATH)
+                    cursor = conn.cursor()
+                    row = cursor.execute(SQL_LOAD_CO2_PROJECT, (project_code,)).fetchone()
+
+                    if row:
+                        (db_project_code, organization, entity_name, unit_name, project_name, base_year, target_year,
+                         implementation_date, life_span, project_owner, input_json, output_json, costing_json,
+                         amp_before, amp_after, amp_uom, calc_method) = row
+
+                        input_data = parse_json_safely(input_json, [{}])
+                        output_data = parse_json_safely(output_json, [{}])
+                        costing_data = parse_json_safely(costing_json, [{}])
+
+                        input_data = normalize_data_rows(input_data)
+                        output_data = normalize_data_rows(output_data, specific_output=(calc_method == 'specific'))
+                        costing_data = normalize_data_rows(costing_data)
+
+                        primary_output_before = 0.0
+                        primary_output_after = 0.0
+                        if output_data and len(output_data) > 0:
+                            if calc_method == 'absolute':
+                                primary_output_before = output_data[0].get('abs_before', 0.0)
+                                primary_output_after = output_data[0].get('abs_after', 0.0)
+                            else:
+                                primary_output_before = output_data[0].get('spec_before', 1.0)
+                                primary_output_after = output_data[0].get('spec_after', 1.0)
+
+                        new_project = {
+                            'project_code': db_project_code,
+                            'organization': organization,
+                            'entity_name': entity_name,
+                            'unit_name': unit_name,
+                            'project_name': project_name,
+                            'base_year': str(base_year),
+                            'target_year': str(target_year),
+                            'implementation_date': str(implementation_date),
+                            'life_span': _parse_life_span(life_span),
+                            'project_owner': project_owner,
+                            'input_data': input_data,
+                            'output_data': output_data,
+                            'costing_data': costing_data,
+                            'amp_before': float(amp_before),
+                            'amp_after': float(amp_after),
+                            'amp_uom': amp_uom,
+                            'calculation_method': calc_method,
+                            'is_loaded_from_db': True,
+                            'primary_output_before': primary_output_before,
+                            'primary_output_after': primary_output_after,
+                        }
 
-                # Check if project with this name already exists (for update)
-                c.execute("SELECT project_code FROM projects WHERE project_name = ?", (project['project_name'],))
-                existing = c.fetchone()
+                        # One state write for the project and every keyed widget that shows it; the one
+                        # full-app rerun is still needed because those widgets live outside this fragment
+                        st.session_state.update({'co2_project': new_project, **loaded_widget_state(new_project)})
+                        st.success(f"✅ Successfully loaded: {selected_display_name}")
+                        st.rerun(scope="app")
+                    else:
+                        st.error("❌ Project not found in database")
+                except Exception as e:
+                    st.error(f"❌ Load error: {str(e)}")
+            else:
+                st.warning("⚠️ Please select a project to load")
 
-                if existing and existing[0] != project['project_code']:
-                    st.error("❌ A project with this name already exists. Please use a different project name.")
-                else:
-                    c.execute(''' 
-                        INSERT OR REPLACE INTO projects 
-                        (project_code, organization, entity_name, unit_name, project_name, base_year, target_year,
-                         implementation_date, life_span, project_owner, input_data, output_data, costing_data,
-                         amp_before, amp_after, amp_uom, calculation_method, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (
-                        project['project_code'],
+        if col4.button("💾 Save", key="co2_save", use_container_width=True):
+            missing = [label for field, label in CO2_REQUIRED_FIELDS if not project[field].strip()]
+            if missing:
+                st.error("❌ Required: " + ", ".join(missing))
+            else:
+                if project['calculation_method'] == 'specific':
+                    project['output_data'] = enforce_specific_rules(project['output_data'], 'specific', 'output')
+
+                if project['output_data'] and len(project['output_data']) > 0:
+                    if project['calculation_method'] == 'absolute':
+                        project['primary_output_before'] = project['output_data'][0].get('abs_before', 0.0)
+                        project['primary_output_after'] = project['output_data'][0].get('abs_after', 0.0)
+                    else:
+                        project['primary_output_before'] = project['output_data'][0].get('spec_before', 1.0)
+                        project['primary_output_after'] = project['output_data'][0].get('spec_after', 1.0)
+
+                # Generate new Project ID if needed or update existing
+                if not project['project_code'] or not project.get('is_loaded_from_db', False):
+                    project['project_code'] = generate_project_id(
                         project['organization'],
                         project['entity_name'],
                         project['unit_name'],
                         project['project_name'],
-                        project['base_year'],
                         project['target_year'],
-                        project['implementation_date'],
-                        project['life_span'],
-                        project['project_owner'],
-                        input_json,
-                        output_json,
-                        costing_json,
-                        float(project['amp_before']),
-                        float(project['amp_after']),
-                        project['amp_uom'],
-                        project['calculation_method']
-                    ))
-                    conn.commit()
-                    conn.close()
+                        project['project_owner']
+                    )
+
+                try:
+                    conn = get_conn(CO2_DB_PATH)
+                    c = conn.cursor()
+
+                    input_json = rows_to_json(project['input_data'])
+                    output_json = rows_to_json(project['output_data'])
+                    costing_json = rows_to_json(project['costing_data'])
+
+                    with write_txn(conn):
+                        c.execute(SQL_SAVE_CO2_PROJECT, (
+                            project['project_code'],
+                            project['organization'],
+                            project['entity_name'],
+                            project['unit_name'],
+                            project['project_name'],
+                            project['base_year'],
+                            project['target_year'],
+                            project['implementation_date'],
+                            project['life_span'],
+                            project['project_owner'],
+                            input_json,
+                            output_json,
+                            costing_json,
+                            float(project['amp_before']),
+                            float(project['amp_after']),
+                            project['amp_uom'],
+                            project['calculation_method']
+                        ))
+                    load_co2_project_options.clear()
 
                     project['is_loaded_from_db'] = True
 
@@ -3692,82 +4123,63 @@ def co2_project_calculator_ui():
                     st.balloons()
                     st.rerun()
 
-            except sqlite3.IntegrityError as e:
-                if "UNIQUE constraint failed" in str(e):
-                    st.error("❌ A project with this Project ID already exists. Please generate a new one.")
-                else:
-                    st.error(f"❌ Database error: {str(e)}")
-            except Exception as e:
-                st.error(f"❌ Save error: {str(e)}")
+                except sqlite3.IntegrityError as e:
+                    if "projects.project_name" in str(e):
+                        st.error("❌ A project with this name already exists. Please use a different project name.")
+                    elif "UNIQUE constraint failed" in str(e):
+                        st.error("❌ A project with this Project ID already exists. Please generate a new one.")
+                    else:
+                        st.error(f"❌ Database error: {str(e)}")
+                except Exception as e:
+                    st.error(f"❌ Save error: {str(e)}")
 
-    # FIXED DELETE BUTTON - NO CONFIRMATION NEEDED
-    if col5.button("🗑️ Delete", key="co2_delete", use_container_width=True):
-        if selected_display_name and selected_project_data:
-            project_code_to_delete = selected_project_data['project_code']
-            try:
-                conn = sqlite3.connect(CO2_DB_PATH)
+        # FIXED DELETE BUTTON - NO CONFIRMATION NEEDED
+        if col5.button("🗑️ Delete", key="co2_delete", use_container_width=True):
+            if selected_display_name and selected_project_data:
+                project_code_to_delete = selected_project_data['project_code']
+                try:
+                    # One transaction for all three deletes (single commit / WAL flush)
+                    with write_txn(get_conn(CO2_DB_PATH)) as conn:
+                        # Tracking data first, then the project itself
+                        for sql in SQL_DELETE_CO2_PROJECT:
+                            conn.execute(sql, (project_code_to_delete,))
+                    load_co2_project_options.clear()
 
-                # First delete related tracking data
-                conn.execute("DELETE FROM project_actuals WHERE project_code = ?", (project_code_to_delete,))
-                conn.execute("DELETE FROM amp_actuals_tracking WHERE project_code = ?", (project_code_to_delete,))
+                    st.success(f"✅ Deleted: {selected_display_name}")
 
-                # Then delete the project
-                conn.execute("DELETE FROM projects WHERE project_code = ?", (project_code_to_delete,))
-                conn.commit()
-                conn.close()
+                    # Clear current project if it matches
+                    if project['project_code'] == project_code_to_delete:
+                        st.session_state.co2_project = _new_co2_project()
 
-                st.success(f"✅ Deleted: {selected_display_name}")
-
-                # Clear current project if it matches
-                if project['project_code'] == project_code_to_delete:
-                    st.session_state.co2_project = {
-                        'project_code': '',
-                        'organization': '',
-                        'entity_name': '',
-                        'unit_name': '',
-                        'project_name': '',
-                        'base_year': '',
-                        'target_year': '',
-                        'implementation_date': '',
-                        'life_span': '10',
-                        'project_owner': '',
-                        'input_data': [{}],
-                        'output_data': [{}],
-                        'costing_data': [{}],
-                        'amp_before': 0.0,
-                        'amp_after': 0.0,
-                        'amp_uom': 't/tp',
-                        'calculation_method': 'absolute',
-                        'is_loaded_from_db': False,
-                        'primary_output_before': 0.0,
-                        'primary_output_after': 0.0,
-                    }
+                    # Force refresh by rerunning
+                    st.rerun()
 
-                # Force refresh by rerunning
-                st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Delete error: {str(e)}")
+            else:
+                st.warning("⚠️ Please select a project to delete")
 
-            except Exception as e:
-                st.error(f"❌ Delete error: {str(e)}")
-        else:
-            st.warning("⚠️ Please select a project to delete")
+    project_management_panel()
 
-    # Display current project info
+    # Display current project info (one placeholder slot, filled in place each rerun)
+    project_banner = st.empty()
     if project['project_code']:
-        method_status = "🔒 FIXED" if project.get('is_loaded_from_db', False) else "✏️ EDITABLE"
-        st.info(
-            f"**Current Project:** {project['project_name']} ({project['project_code']}) - {project['calculation_method'].upper()} method - {method_status}")
-
-        # Show Project ID details
-        with st.expander("📋 Project ID Details", expanded=False):
-            st.write(f"""
-            **Project ID Components:**
-            - **Organization:** {project['organization']}
-            - **Entity:** {project['entity_name']}
-            - **Unit:** {project['unit_name']}
-            - **Project Name:** {project['project_name']}
-            - **Target Year:** {project['target_year']}
-            - **Project Owner:** {project['project_owner']}
-            """)
+        with project_banner.container():
+            method_status = "🔒 FIXED" if project.get('is_loaded_from_db', False) else "✏️ EDITABLE"
+            st.info(
+                f"**Current Project:** {project['project_name']} ({project['project_code']}) - {project['calculation_method'].upper()} method - {method_status}")
+
+            # Show Project ID details
+            with st.expander("📋 Project ID Details", expanded=False):
+                st.write(f"""
+                **Project ID Components:**
+                - **Organization:** {project['organization']}
+                - **Entity:** {project['entity_name']}
+                - **Unit:** {project['unit_name']}
+                - **Project Name:** {project['project_name']}
+                - **Target Year:** {project['target_year']}
+                - **Project Owner:** {project['project_owner']}
+                """)
 
     # --- General Information (Narrow Fields) ---
     st.subheader("📝 General Information")
@@ -3776,11 +4188,10 @@ def co2_project_calculator_ui():
     with g1:
         st.markdown("**Organization**")
         if organizations_list:
-            current_org = project['organization'] if project['organization'] in organizations_list else ""
             selected_org = st.selectbox(
                 "",
                 options=[""] + organizations_list,
-                index=organizations_list.index(current_org) + 1 if current_org in organizations_list else 0,
+                index=organization_index.get(project['organization'], -1) + 1,
                 label_visibility="collapsed",
                 key="co2_org_dropdown"
             )
@@ -3813,8 +4224,8 @@ def co2_project_calculator_ui():
         st.markdown("**Implementation Date**")
         if project['implementation_date']:
             try:
-                date_obj = datetime.strptime(project['implementation_date'], '%Y-%m-%d')
-            except:
+                date_obj = datetime.fromisoformat(project['implementation_date'])
+            except (TypeError, ValueError):
                 date_obj = datetime.today()
         else:
             date_obj = datetime.today()
@@ -3825,11 +4236,11 @@ def co2_project_calculator_ui():
             label_visibility="collapsed",
             key="co2_impl_date_picker"
         )
-        project['implementation_date'] = selected_date.strftime('%Y-%m-%d')
+        project['implementation_date'] = selected_date.isoformat()
 
         st.markdown("**Life Span (Years)**")
-        project['life_span'] = st.text_input("", value=project['life_span'], label_visibility="collapsed",
-                                             key="co2_life_span")
+        project['life_span'] = st.number_input("", min_value=1, step=1, value=_parse_life_span(project['life_span']),
+                                               label_visibility="collapsed", key="co2_life_span")
 
     with g5:
         st.markdown("**Project Owner**")
@@ -3881,708 +4292,509 @@ def co2_project_calculator_ui():
     if not is_loaded_from_db and is_specific:
         project['output_data'] = enforce_specific_rules(project['output_data'], 'specific', 'output')
 
-    # --- Table Renderer ---
-    def render_emission_table(title, data_key, is_output=False):
-        st.subheader(f"📋 {title}")
-
-        base_headers = ["Material", "UOM", "Emission Factor (tCO₂e/unit)"]
-        if is_absolute:
-            headers = base_headers + ["Absolute Before", "Absolute After"]
-        elif is_specific:
-            headers = base_headers + ["Specific Before", "Specific After"]
-
-        header_cols = st.columns(len(headers) + 1)
-        for idx, h in enumerate(headers):
-            header_cols[idx].markdown(f"**{h}**")
-        header_cols[-1].markdown("**Action**")
-
-        updated_data = []
-        current_data = project.get(data_key, [{}])
-
-        for i in range(len(current_data)):
-            row = current_data[i] if i < len(current_data) else {}
-            c = st.columns(len(headers) + 1)
-            row_dict = {}
-
-            material = row.get('material', '')
-            uom = row.get('uom', '')
-            ef = float(row.get('ef', 0.0))
-
-            # Material field - special handling for output data
-            if is_output and i == 0:
-                # First output row is fixed as "Main Output"
-                row_dict['material'] = "Main Output"
-                c[0].text_input("", value="Main Output", disabled=True, label_visibility="collapsed",
-                                key=f"{data_key}_mat_{i}")
-            else:
-                row_dict['material'] = c[0].text_input("", value=material, label_visibility="collapsed",
-                                                       key=f"{data_key}_mat_{i}")
-
-            row_dict['uom'] = c[1].text_input("", value=uom, label_visibility="collapsed", key=f"{data_key}_uom_{i}")
-            row_dict['ef'] = c[2].number_input("", value=ef, format="%.6f", label_visibility="collapsed",
-                                               key=f"{data_key}_ef_{i}")
-
-            col_idx = 3
-
-            if is_absolute:
-                abs_before = float(row.get('abs_before', 0.0))
-                abs_after = float(row.get('abs_after', 0.0))
-
-                row_dict['abs_before'] = c[col_idx].number_input(
-                    "", value=abs_before, label_visibility="collapsed", key=f"{data_key}_abs_b_{i}"
-                )
-                col_idx += 1
-                row_dict['abs_after'] = c[col_idx].number_input(
-                    "", value=abs_after, label_visibility="collapsed", key=f"{data_key}_abs_a_{i}"
-                )
-                col_idx += 1
-
-            if is_specific:
-                spec_before = float(row.get('spec_before', 0.0))
-                spec_after = float(row.get('spec_after', 0.0))
-
-                if is_output:
-                    row_dict['abs_before'] = 1.0
-                    spec_before = 1.0
-                    spec_after = 1.0
-
-                if is_output:
-                    row_dict['spec_before'] = 1.0
-                    c[col_idx].number_input(
-                        "", value=1.0, disabled=True, label_visibility="collapsed", key=f"{data_key}_spec_b_{i}"
-                    )
-                else:
-                    row_dict['spec_before'] = c[col_idx].number_input(
-                        "", value=spec_before, label_visibility="collapsed", key=f"{data_key}_spec_b_{i}"
-                    )
-                col_idx += 1
-
-                if is_output:
-                    row_dict['spec_after'] = 1.0
-                    c[col_idx].number_input(
-                        "", value=1.0, disabled=True, label_visibility="collapsed", key=f"{data_key}_spec_a_{i}"
-                    )
+    # --- Tables + Emission Results ---
+    # One fragment: editing a value reruns only the tables and results, not the whole page.
+    # Adding/deleting rows reruns the full app only while the tracking section (which lists the rows) is open.
+    @st.fragment
+    def emission_tables_and_results():
+        """Input/Output/AMP/Costing tables and the Emission Results; False if there is nothing to show"""
+        # --- Table Editors ---
+        # Each table is one st.data_editor over a base frame kept in the project dict. The frame holds
+        # every field as a typed column (absolute and specific), column_order shows the current method's.
+        # The base (and so the widget key) only changes on New/Load, a method switch, or when Streamlit has
+        # dropped the editor's state (e.g. after visiting another page), so the editor's deltas always apply
+        # to the frame they were made against. A table's rows are only rebuilt from its editor after an
+        # edit (on_change) or a fresh base; other reruns leave them untouched.
+        app_run = st.session_state.get('_app_run', 0)
+        # Already rendered in this full run: this pass is a fragment rerun
+        fragment_run = project.get('_editors_run') == app_run
+        if project.get('_editors_run') not in (app_run, app_run - 1):
+            # Not rendered in the previous full run: the editors' states are gone, so a kept base would
+            # replay the next delta onto stale rows. Rebuild every base from the stored rows.
+            project.pop('_editor_bases', None)
+        project['_editors_run'] = app_run
+        dirty_tables = project.setdefault('_dirty_tables', set())
+        # (rows, numeric arrays) of the input/output tables, rebuilt together with the rows
+        table_values = project.setdefault('_table_values', {})
+
+        def mark_table_edited(data_key):
+            dirty_tables.add(data_key)
+
+        def editor_base(data_key, columns, view, fixed_names=()):
+            """Stable (base frame, widget key) for a table editor"""
+            bases = project.setdefault('_editor_bases', {})
+            entry = bases.get(data_key)
+            if entry is None or entry[1] != view:
+                rows = [row for row in (project.get(data_key) or []) if isinstance(row, dict)] or [{}]
+                while len(rows) < len(fixed_names):
+                    rows.append({})
+                records = [{col: row.get(col, '' if col in ('material', 'uom') else 0.0) for col in columns}
+                           for row in rows]
+                for i, name in enumerate(fixed_names):
+                    records[i]['material'] = name
+                frame = pd.DataFrame(records, columns=columns)
+                for col in columns:
+                    if col not in ('material', 'uom'):
+                        frame[col] = pd.to_numeric(frame[col], errors='coerce').fillna(0.0).astype(float)
+                entry = bases[data_key] = (uuid.uuid4().hex[:8], view, frame)
+                dirty_tables.add(data_key)
+            return entry[2], f"co2_{data_key}_editor_{entry[0]}"
+
+        def editor_records(frame, columns):
+            """Edited frame -> list of row dicts (blank text '', blank numbers 0.0)"""
+            frame = frame.copy()
+            for col in columns:
+                if col in ('material', 'uom'):
+                    frame[col] = frame[col].fillna('').astype(str)
                 else:
-                    row_dict['spec_after'] = c[col_idx].number_input(
-                        "", value=spec_after, label_visibility="collapsed", key=f"{data_key}_spec_a_{i}"
-                    )
-                col_idx += 1
-
-            # Delete button - protect first row for output data
-            delete_disabled = (i == 0) and (data_key in ['input_data', 'output_data'])
-            if c[-1].button("❌", key=f"delete_{data_key}_{i}", disabled=delete_disabled):
-                if i > 0:
-                    project[data_key].pop(i)
-                    st.rerun()
-
-            updated_data.append(row_dict)
-
-        project[data_key] = updated_data
-
-        if st.button(f"➕ Add Row", key=f"add_row_{data_key}", use_container_width=True):
-            new_row = {'material': '', 'uom': '', 'ef': 0.0}
-            if is_absolute:
-                new_row['abs_before'] = 0.0
-                new_row['abs_after'] = 0.0
-            if is_specific:
-                if data_key == 'output_data' and is_output:
-                    new_row['abs_before'] = 1.0
-                    new_row['spec_before'] = 1.0
-                    new_row['spec_after'] = 1.0
-                else:
-                    new_row['spec_before'] = 0.0
-                    new_row['spec_after'] = 0.0
-            project[data_key].append(new_row)
-            st.rerun()
-
-    # Input & Output Tables
-    render_emission_table("Input Data", "input_data", is_output=False)
-    render_emission_table("Output Data", "output_data", is_output=True)
-
-    # --- AMP (only in Specific mode) ---
-    if is_specific:
-        st.subheader("🏭 Annual Material Production (AMP)")
-        a1, a2, a3 = st.columns(3)
-        project['amp_before'] = a1.number_input("AMP Before", value=project['amp_before'], key="co2_amp_before")
-        project['amp_after'] = a2.number_input("AMP After", value=project['amp_after'], key="co2_amp_after")
-        project['amp_uom'] = a3.selectbox(
-            "UOM",
-            ["t/tp", "kl/tp", "kWh/tp", "kg/tp", "tons/tp"],
-            index=["t/tp", "kl/tp", "kWh/tp", "kg/tp", "tons/tp"].index(project['amp_uom']) if project['amp_uom'] in [
-                "t/tp", "kl/tp", "kWh/tp", "kg/tp", "tons/tp"] else 0,
-            key="co2_amp_uom"
-        )
-    elif is_loaded_from_db and project.get('calculation_method', '') == 'absolute':
-        pass
-
-    # --- Costing Table (No EF) ---
-    st.subheader("💰 Costing Data")
-
-    def render_costing_table():
-        costing_headers = ["Particular", "UOM"]
-        if is_absolute:
-            costing_headers += ["Absolute Before", "Absolute After"]
+                    frame[col] = pd.to_numeric(frame[col], errors='coerce').fillna(0.0).astype(float)
+            return frame.to_dict(orient='records')
+
+        def restore_fixed_rows(key, base, rows, columns, fixed_count):
+            """Put back any of the first `fixed_count` rows deleted in the editor; True if one was restored"""
+            state = st.session_state.get(key) or {}
+            deleted = sorted(i for i in state.get('deleted_rows', ()) if i < fixed_count)
+            edits = state.get('edited_rows', {})
+            for i in deleted:
+                record = base.iloc[i].to_dict()
+                record.update(edits.get(i, {}))
+                rows.insert(i, editor_records(pd.DataFrame([record], columns=columns), columns)[0])
+            return bool(deleted)
+
+        def rerun_tracking():
+            """Rerun the whole app so an open tracking section picks up changed rows / EFs / AMP"""
+            # Collapsed tracking renders nothing and reruns the app itself when opened
+            if st.session_state.get('co2_tracking_expander'):
+                st.rerun(scope="app")
+
+        def rerun_tables():
+            """Rerun just the tables in a fragment rerun; during a full-app run only an app rerun is allowed"""
+            st.rerun(scope="fragment" if fragment_run else "app")
+
+        def store_table_rows(data_key, rows):
+            """Save the edited rows; any change reruns the app while the tracking section shows"""
+            changed = rows != project.get(data_key)
+            project[data_key] = rows
+            if changed:
+                rerun_tracking()
+
+        def render_emission_table(title, data_key, is_output=False):
+            st.subheader(f"📋 {title}")
+
+            value_cols = ['abs_before', 'abs_after'] if is_absolute else ['spec_before', 'spec_after']
+            columns = list(CO2_TABLE_FIELDS)
+            view = ['material', 'uom', 'ef'] + value_cols
+            fixed_names = ("Main Output",) if is_output else ()
+            # Specific-method outputs are fixed at 1.0
+            fixed_values = is_specific and is_output
+
+            base, key = editor_base(data_key, columns, view, fixed_names)
+            value_labels = ("Absolute Before", "Absolute After") if is_absolute else ("Specific Before", "Specific After")
+            edited = st.data_editor(
+                base,
+                key=key,
+                on_change=mark_table_edited,
+                args=(data_key,),
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_order=view,
+                disabled=value_cols if fixed_values else False,
+                column_config={
+                    'material': st.column_config.TextColumn("Material"),
+                    'uom': st.column_config.TextColumn("UOM"),
+                    'ef': st.column_config.NumberColumn("Emission Factor (tCO₂e/unit)", format="%.6f"),
+                    value_cols[0]: st.column_config.NumberColumn(value_labels[0]),
+                    value_cols[1]: st.column_config.NumberColumn(value_labels[1]),
+                }
+            )
+            if is_output:
+                st.caption("The first output row is the Main Output.")
+            if data_key not in dirty_tables:
+                return
+            dirty_tables.discard(data_key)
+
+            rows = editor_records(edited, columns)
+            # First row is protected: a deleted first row is put back (never renaming the next one)
+            restored = restore_fixed_rows(key, base, rows, columns, 1)
+            if restored:
+                # Re-base so the editor shows the restored row again (before any rerun below)
+                project['_editor_bases'].pop(data_key, None)
+            for i, name in enumerate(fixed_names):
+                rows[i]['material'] = name
+            if fixed_values:
+                for row in rows:
+                    row['abs_before'] = 1.0
+                    row['spec_before'] = 1.0
+                    row['spec_after'] = 1.0
+            table_values[data_key] = (rows, row_columns(rows, CO2_VALUE_FIELDS))
+            store_table_rows(data_key, rows)
+            if restored:
+                rerun_tables()
+
+        # Input & Output Tables
+        render_emission_table("Input Data", "input_data", is_output=False)
+        render_emission_table("Output Data", "output_data", is_output=True)
+
+        # --- AMP (only in Specific mode) ---
         if is_specific:
-            costing_headers += ["Specific Before", "Specific After"]
-
-        header_cols = st.columns(len(costing_headers) + 1)
-        for idx, h in enumerate(costing_headers):
-            header_cols[idx].markdown(f"**{h}**")
-        header_cols[-1].markdown("**Action**")
-
-        updated_costing = []
-        current_costing = project.get('costing_data', [{}])
-
-        # Ensure we have at least 3 rows for costing data
-        while len(current_costing) < 3:
-            current_costing.append({})
-
-        for i in range(len(current_costing)):
-            row = current_costing[i] if i < len(current_costing) else {}
-            c = st.columns(len(costing_headers) + 1)
-            row_dict = {}
-
-            # Special handling for first three rows
-            if i == 0:
-                # First row: CAPEX (fixed)
-                row_dict['material'] = "CAPEX"
-                c[0].text_input("", value="CAPEX", disabled=True, label_visibility="collapsed",
-                                key=f"cost_mat_{i}")
-            elif i == 1:
-                # Second row: OPEX-Only Fuel/Energy (fixed)
-                row_dict['material'] = "OPEX-Only Fuel/Energy"
-                c[0].text_input("", value="OPEX-Only Fuel/Energy", disabled=True, label_visibility="collapsed",
-                                key=f"cost_mat_{i}")
-            elif i == 2:
-                # Third row: OPEX-Other than Fuel/Energy (fixed)
-                row_dict['material'] = "OPEX-Other than Fuel/Energy"
-                c[0].text_input("", value="OPEX-Other than Fuel/Energy", disabled=True, label_visibility="collapsed",
-                                key=f"cost_mat_{i}")
-            else:
-                # Other rows: editable
-                row_dict['material'] = c[0].text_input("", value=row.get('material', ''), label_visibility="collapsed",
-                                                       key=f"cost_mat_{i}")
-
-            row_dict['uom'] = c[1].text_input("", value=row.get('uom', ''), label_visibility="collapsed",
-                                              key=f"cost_uom_{i}")
-
-            col_idx = 2
-
-            if is_absolute:
-                abs_before = float(row.get('abs_before', 0.0))
-                abs_after = float(row.get('abs_after', 0.0))
-
-                row_dict['abs_before'] = c[col_idx].number_input(
-                    "", value=abs_before, label_visibility="collapsed", key=f"cost_abs_b_{i}"
-                )
-                col_idx += 1
-                row_dict['abs_after'] = c[col_idx].number_input(
-                    "", value=abs_after, label_visibility="collapsed", key=f"cost_abs_a_{i}"
-                )
-                col_idx += 1
-
-            if is_specific:
-                spec_before = float(row.get('spec_before', 0.0))
-                spec_after = float(row.get('spec_after', 0.0))
-
-                row_dict['spec_before'] = c[col_idx].number_input(
-                    "", value=spec_before, label_visibility="collapsed", key=f"cost_spec_b_{i}"
-                )
-                col_idx += 1
-                row_dict['spec_after'] = c[col_idx].number_input(
-                    "", value=spec_after, label_visibility="collapsed", key=f"cost_spec_a_{i}"
-                )
-                col_idx += 1
-
-            # Delete button - protect first 3 rows
-            if c[-1].button("❌", key=f"delete_cost_{i}", disabled=(i < 3)):
-                if i >= 3:
-                    project['costing_data'].pop(i)
-                    st.rerun()
-
-            updated_costing.append(row_dict)
-
-        project['costing_data'] = updated_costing
-
-        # Ensure minimum 3 rows for costing
-        while len(project['costing_data']) < 3:
-            project['costing_data'].append({'material': '', 'uom': ''})
-            if is_absolute:
-                project['costing_data'][-1]['abs_before'] = 0.0
-                project['costing_data'][-1]['abs_after'] = 0.0
-            if is_specific:
-                project['costing_data'][-1]['spec_before'] = 0.0
-                project['costing_data'][-1]['spec_after'] = 0.0
-
-        # Add row button
-        if st.button("➕ Add Row - Costing", key="add_row_costing", use_container_width=True):
-            new_row = {'material': '', 'uom': ''}
-            if is_absolute:
-                new_row['abs_before'] = 0.0
-                new_row['abs_after'] = 0.0
-            if is_specific:
-                new_row['spec_before'] = 0.0
-                new_row['spec_after'] = 0.0
-            project['costing_data'].append(new_row)
-            st.rerun()
+            st.subheader("🏭 Annual Material Production (AMP)")
+            previous_amp = (project['amp_before'], project['amp_after'], project['amp_uom'])
+            a1, a2, a3 = st.columns(3)
+            project['amp_before'] = a1.number_input("AMP Before", value=project['amp_before'], key="co2_amp_before")
+            project['amp_after'] = a2.number_input("AMP After", value=project['amp_after'], key="co2_amp_after")
+            project['amp_uom'] = a3.selectbox(
+                "UOM",
+                AMP_UOMS,
+                index=AMP_UOM_INDEX.get(project['amp_uom'], 0),
+                key="co2_amp_uom"
+            )
+            if (project['amp_before'], project['amp_after'], project['amp_uom']) != previous_amp:
+                rerun_tracking()
+        elif is_loaded_from_db and project.get('calculation_method', '') == 'absolute':
+            pass
+
+        # --- Costing Table (No EF) ---
+        st.subheader("💰 Costing Data")
+
+        def render_costing_table():
+            value_cols = ['abs_before', 'abs_after'] if is_absolute else ['spec_before', 'spec_after']
+            columns = list(CO2_COSTING_FIELDS)
+            view = ['material', 'uom'] + value_cols
+            # First three rows are fixed particulars
+            fixed_names = ("CAPEX", "OPEX-Only Fuel/Energy", "OPEX-Other than Fuel/Energy")
+
+            base, key = editor_base('costing_data', columns, view, fixed_names)
+            value_labels = ("Absolute Before", "Absolute After") if is_absolute else ("Specific Before", "Specific After")
+            edited = st.data_editor(
+                base,
+                key=key,
+                on_change=mark_table_edited,
+                args=('costing_data',),
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_order=view,
+                column_config={
+                    'material': st.column_config.TextColumn("Particular"),
+                    'uom': st.column_config.TextColumn("UOM"),
+                    value_cols[0]: st.column_config.NumberColumn(value_labels[0]),
+                    value_cols[1]: st.column_config.NumberColumn(value_labels[1]),
+                }
+            )
+            st.caption("The first three rows (CAPEX and the two OPEX lines) are fixed.")
+            if 'costing_data' not in dirty_tables:
+                return
+            dirty_tables.discard('costing_data')
+
+            rows = editor_records(edited, columns)
+            # Deleted fixed particulars are put back in place; ensure minimum 3 rows for costing
+            restored = restore_fixed_rows(key, base, rows, columns, len(fixed_names))
+            if restored:
+                project['_editor_bases'].pop('costing_data', None)
+            while len(rows) < len(fixed_names):
+                rows.append({col: ('' if col == 'uom' else 0.0) for col in columns})
+            for i, name in enumerate(fixed_names):
+                rows[i]['material'] = name
+            store_table_rows('costing_data', rows)
+            if restored:
+                rerun_tables()
+
+        render_costing_table()
+
+        # --- ALWAYS SHOW RESULTS SECTION ---
+        st.subheader("📊 Emission Results")
+
+        # Validate data
+        if not project['input_data']:
+            st.info("ℹ️ Add input data to see results")
+            return False
+
+        if not project['output_data']:
+            st.info("ℹ️ Add output data to see results")
+            return False
+
+        # Calculate emissions
+        amp_before = float(project['amp_before']) if is_specific else 1.0
+        amp_after = float(project['amp_after']) if is_specific else 1.0
+
+        def calculate_emission(section_data, section_name="data"):
+            # The arrays only stand for the row list they were built from; a list replaced outside the
+            # editor (Save, Load, enforce_specific_rules) is read afresh
+            cached = table_values.get(f"{section_name}_data")
+            values = cached[1] if cached is not None and cached[0] is section_data else None
+            return section_emission_totals(section_data, is_absolute, amp_before, amp_after,
+                                           fixed_output=(section_name == 'output'), values=values)
 
-    render_costing_table()
+        try:
+            input_before, input_after = calculate_emission(project['input_data'], 'input')
+            output_before, output_after = calculate_emission(project['output_data'], 'output')
 
-    # --- ALWAYS SHOW RESULTS SECTION ---
-    st.subheader("📊 Emission Results")
+            net_before = input_before - output_before
+            net_after = input_after - output_after
 
-    # Validate data
-    if not project['input_data']:
-        st.info("ℹ️ Add input data to see results")
-        return
+            primary_output_before = 0.0
+            primary_output_after = 0.0
 
-    if not project['output_data']:
-        st.info("ℹ️ Add output data to see results")
-        return
-
-    # Calculate emissions
-    amp_before = float(project['amp_before']) if is_specific else 1.0
-    amp_after = float(project['amp_after']) if is_specific else 1.0
+            if project['output_data'] and len(project['output_data']) > 0:
+                first_output = project['output_data'][0]
+                if is_absolute:
+                    primary_output_before = float(first_output.get('abs_before', 0.0))
+                    primary_output_after = float(first_output.get('abs_after', 0.0))
+                else:
+                    primary_output_before = 1.0
+                    primary_output_after = 1.0
 
-    def calculate_emission(section_data, section_name="data"):
-        total_before = total_after = 0.0
+            project['primary_output_before'] = primary_output_before
+            project['primary_output_after'] = primary_output_after
 
-        for row in section_data:
-            ef = float(row.get('ef', 0.0))
+            sp_net_before = 0.0
+            sp_net_after = 0.0
+            co2_reduction = 0.0
 
             if is_absolute:
-                abs_before = float(row.get('abs_before', 0.0))
-                abs_after = float(row.get('abs_after', 0.0))
+                if primary_output_before != 0:
+                    sp_net_before = net_before / primary_output_before
+                if primary_output_after != 0:
+                    sp_net_after = net_after / primary_output_after
 
-                total_before += abs_before * ef
-                total_after += abs_after * ef
+                co2_reduction = (sp_net_before - sp_net_after) * primary_output_after
 
             else:
-                spec_before = float(row.get('spec_before', 0.0))
-                spec_after = float(row.get('spec_after', 0.0))
-
-                if section_name == 'output':
-                    spec_before = 1.0
-                    spec_after = 1.0
-
-                total_before += (amp_before * spec_before) * ef
-                total_after += (amp_after * spec_after) * ef
-
-        return total_before, total_after
-
-    try:
-        input_before, input_after = calculate_emission(project['input_data'], 'input')
-        output_before, output_after = calculate_emission(project['output_data'], 'output')
-
-        net_before = input_before - output_before
-        net_after = input_after - output_after
+                if amp_before != 0:
+                    sp_net_before = net_before / amp_before
+                if amp_after != 0:
+                    sp_net_after = net_after / amp_after
+
+                co2_reduction = (sp_net_before - sp_net_after) * amp_after
+
+            input_net_change = input_before - input_after
+            output_net_change = output_before - output_after
+            net_net_change = net_before - net_after
+            sp_net_net_change = sp_net_before - sp_net_after
+
+            baseline_values = {
+                'input_before': input_before,
+                'input_after': input_after,
+                'output_before': output_before,
+                'output_after': output_after,
+                'net_before': net_before,
+                'net_after': net_after,
+                'sp_net_before': sp_net_before,
+                'sp_net_after': sp_net_after,
+                'co2_reduction': co2_reduction,
+                'primary_output_before': primary_output_before,
+                'primary_output_after': primary_output_after,
+                'amp_before': amp_before,
+                'amp_after': amp_after
+            }
+            # The tracking section compares each year against these; refreshed on every calculation
+            project['emission_results_calculated'] = baseline_values
+
+            # Numeric frame; the Styler formats the cells when the table is rendered
+            results_df = pd.DataFrame({
+                "Parameter": ["Input CO₂", "Output CO₂", "Net CO₂", "Sp.Net (tCO₂e/unit)", "CO₂ Reduction"],
+                "Before": [input_before, output_before, net_before, sp_net_before, np.nan],
+                "After": [input_after, output_after, net_after, sp_net_after, co2_reduction],
+                "Net Change": [input_net_change, output_net_change, net_net_change, sp_net_net_change, co2_reduction],
+            })
+            value_columns = ["Before", "After", "Net Change"]
+            results_style = (
+                results_df.style
+                .format("{:,.2f}", subset=value_columns, na_rep="")
+                .format("{:,.6f}", subset=pd.IndexSlice[[3], value_columns])
+            )
 
-        primary_output_before = 0.0
-        primary_output_after = 0.0
+            st.dataframe(
+                results_style,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Parameter": st.column_config.TextColumn("Parameter", width="medium"),
+                    "Before": st.column_config.Column("Before", width="medium"),
+                    "After": st.column_config.Column("After", width="medium"),
+                    "Net Change": st.column_config.Column("Net Change", width="medium")
+                }
+            )
 
-        if project['output_data'] and len(project['output_data']) > 0:
-            first_output = project['output_data'][0]
             if is_absolute:
-                primary_output_before = float(first_output.get('abs_before', 0.0))
-                primary_output_after = float(first_output.get('abs_after', 0.0))
+                st.info(f"""
+                **Absolute Method Calculation Details:**
+                - **Sp.Net_Before** = Net CO₂_Before / Primary Output_Before = {net_before:,.2f} / {primary_output_before:,.2f} = {sp_net_before:,.6f} tCO₂e/unit
+                - **Sp.Net_After** = Net CO₂_After / Primary Output_After = {net_after:,.2f} / {primary_output_after:,.2f} = {sp_net_after:,.6f} tCO₂e/unit
+                - **CO₂ Reduction** = (Sp.Net_Before - Sp.Net_After) × Primary Output_After = ({sp_net_before:,.6f} - {sp_net_after:,.6f}) × {primary_output_after:,.2f} = {co2_reduction:,.2f} tCO₂e
+                """)
             else:
-                primary_output_before = 1.0
-                primary_output_after = 1.0
-
-        project['primary_output_before'] = primary_output_before
-        project['primary_output_after'] = primary_output_after
-
-        sp_net_before = 0.0
-        sp_net_after = 0.0
-        co2_reduction = 0.0
-
-        if is_absolute:
-            if primary_output_before != 0:
-                sp_net_before = net_before / primary_output_before
-            if primary_output_after != 0:
-                sp_net_after = net_after / primary_output_after
-
-            co2_reduction = (sp_net_before - sp_net_after) * primary_output_after
-
-        else:
-            if amp_before != 0:
-                sp_net_before = net_before / amp_before
-            if amp_after != 0:
-                sp_net_after = net_after / amp_after
-
-            co2_reduction = (sp_net_before - sp_net_after) * amp_after
-
-        input_net_change = input_before - input_after
-        output_net_change = output_before - output_after
-        net_net_change = net_before - net_after
-        sp_net_net_change = sp_net_before - sp_net_after
-
-        baseline_values = {
-            'input_before': input_before,
-            'input_after': input_after,
-            'output_before': output_before,
-            'output_after': output_after,
-            'net_before': net_before,
-            'net_after': net_after,
-            'sp_net_before': sp_net_before,
-            'sp_net_after': sp_net_after,
-            'co2_reduction': co2_reduction,
-            'primary_output_before': primary_output_before,
-            'primary_output_after': primary_output_after,
-            'amp_before': amp_before,
-            'amp_after': amp_after
-        }
-
-        results_data = {
-            "Parameter": ["Input CO₂", "Output CO₂", "Net CO₂", "Sp.Net (tCO₂e/unit)", "CO₂ Reduction"],
-            "Before": [
-                f"{input_before:,.2f}",
-                f"{output_before:,.2f}",
-                f"{net_before:,.2f}",
-                f"{sp_net_before:,.6f}",
-                ""
-            ],
-            "After": [
-                f"{input_after:,.2f}",
-                f"{output_after:,.2f}",
-                f"{net_after:,.2f}",
-                f"{sp_net_after:,.6f}",
-                f"{co2_reduction:,.2f}"
-            ],
-            "Net Change": [
-                f"{input_net_change:,.2f}",
-                f"{output_net_change:,.2f}",
-                f"{net_net_change:,.2f}",
-                f"{sp_net_net_change:,.6f}",
-                f"{co2_reduction:,.2f}"
-            ]
-        }
-
-        results_df = pd.DataFrame(results_data)
-
-        st.dataframe(
-            results_df,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Parameter": st.column_config.TextColumn("Parameter", width="medium"),
-                "Before": st.column_config.TextColumn("Before", width="medium"),
-                "After": st.column_config.TextColumn("After", width="medium"),
-                "Net Change": st.column_config.TextColumn("Net Change", width="medium")
-            }
-        )
-
-        if is_absolute:
-            st.info(f"""
-            **Absolute Method Calculation Details:**
-            - **Sp.Net_Before** = Net CO₂_Before / Primary Output_Before = {net_before:,.2f} / {primary_output_before:,.2f} = {sp_net_before:,.6f} tCO₂e/unit
-            - **Sp.Net_After** = Net CO₂_After / Primary Output_After = {net_after:,.2f} / {primary_output_after:,.2f} = {sp_net_after:,.6f} tCO₂e/unit
-            - **CO₂ Reduction** = (Sp.Net_Before - Sp.Net_After) × Primary Output_After = ({sp_net_before:,.6f} - {sp_net_after:,.6f}) × {primary_output_after:,.2f} = {co2_reduction:,.2f} tCO₂e
-            """)
-        else:
-            st.info(f"""
-            **Specific Method Calculation Details:**
-            - **Sp.Net_Before** = Net CO₂_Before / AMP_Before = {net_before:,.2f} / {amp_before:,.2f} = {sp_net_before:,.6f} tCO₂e/unit
-            - **Sp.Net_After** = Net CO₂_After / AMP_After = {net_after:,.2f} / {amp_after:,.2f} = {sp_net_after:,.6f} tCO₂e/unit
-            - **CO₂ Reduction** = (Sp.Net_Before - Sp.Net_After) × AMP_After = ({sp_net_before:,.6f} - {sp_net_after:,.6f}) × {amp_after:,.2f} = {co2_reduction:,.2f} tCO₂e
-            """)
-
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Total CO₂ Reduction", f"{co2_reduction:,.2f} tCO₂e",
-                    delta=f"{co2_reduction:,.0f} tCO₂e" if co2_reduction > 0 else f"{co2_reduction:,.0f} tCO₂e",
-                    delta_color="normal" if co2_reduction > 0 else "inverse")
-
-        if net_before > 0:
-            reduction_pct = (co2_reduction / net_before * 100)
-        else:
-            reduction_pct = 0.0
-
-        col2.metric("Reduction %", f"{reduction_pct:.1f}%",
-                    delta=f"{reduction_pct:.1f}%" if reduction_pct > 0 else f"{reduction_pct:.1f}%",
-                    delta_color="normal" if reduction_pct > 0 else "inverse")
+                st.info(f"""
+                **Specific Method Calculation Details:**
+                - **Sp.Net_Before** = Net CO₂_Before / AMP_Before = {net_before:,.2f} / {amp_before:,.2f} = {sp_net_before:,.6f} tCO₂e/unit
+                - **Sp.Net_After** = Net CO₂_After / AMP_After = {net_after:,.2f} / {amp_after:,.2f} = {sp_net_after:,.6f} tCO₂e/unit
+                - **CO₂ Reduction** = (Sp.Net_Before - Sp.Net_After) × AMP_After = ({sp_net_before:,.6f} - {sp_net_after:,.6f}) × {amp_after:,.2f} = {co2_reduction:,.2f} tCO₂e
+                """)
 
-        col3.metric("Sp.Net Improvement", f"{sp_net_net_change:,.6f} tCO₂e/unit",
-                    delta=f"{sp_net_net_change:,.6f}" if sp_net_net_change > 0 else f"{sp_net_net_change:,.6f}",
-                    delta_color="normal" if sp_net_net_change > 0 else "inverse")
-
-        col4.metric("Method Used", project['calculation_method'].upper())
-
-        fig = go.Figure()
-
-        fig.add_trace(go.Bar(
-            name='Before',
-            x=['Input CO₂', 'Output CO₂', 'Net CO₂', 'Sp.Net'],
-            y=[input_before, output_before, net_before, sp_net_before * 10000],
-            marker_color='blue'
-        ))
-
-        fig.add_trace(go.Bar(
-            name='After',
-            x=['Input CO₂', 'Output CO₂', 'Net CO₂', 'Sp.Net'],
-            y=[input_after, output_after, net_after, sp_net_after * 10000],
-            marker_color='green'
-        ))
-
-        fig.add_trace(go.Scatter(
-            name='CO₂ Reduction',
-            x=['CO₂ Reduction'],
-            y=[co2_reduction],
-            mode='markers+text',
-            marker=dict(
-                size=15,
-                color='red',
-                symbol='diamond'
-            ),
-            text=[f"{co2_reduction:,.0f}"],
-            textposition='top center',
-            showlegend=True
-        ))
-
-        fig.update_layout(
-            title='CO₂ Emissions Analysis with Sp.Net and Reduction',
-            barmode='group',
-            yaxis_title='tCO₂e (Sp.Net × 10,000)',
-            template='plotly_white',
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            annotations=[
-                dict(
-                    x='Sp.Net',
-                    y=sp_net_before * 10000,
-                    text=f"Sp.Net_Before: {sp_net_before:.6f}",
-                    showarrow=True,
-                    arrowhead=2,
-                    ax=0,
-                    ay=-40
-                ),
-                dict(
-                    x='Sp.Net',
-                    y=sp_net_after * 10000,
-                    text=f"Sp.Net_After: {sp_net_after:.6f}",
-                    showarrow=True,
-                    arrowhead=2,
-                    ax=0,
-                    ay=40
-                )
-            ]
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-        fig_reduction = go.Figure()
-
-        if is_absolute:
-            fig_reduction.add_trace(go.Bar(
-                name='Sp.Net_Before',
-                x=['Sp.Net Before'],
-                y=[sp_net_before],
-                marker_color='blue',
-                text=[f"{sp_net_before:.6f}"],
-                textposition='auto'
-            ))
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Total CO₂ Reduction", f"{co2_reduction:,.2f} tCO₂e",
+                        delta=f"{co2_reduction:,.0f} tCO₂e" if co2_reduction > 0 else f"{co2_reduction:,.0f} tCO₂e",
+                        delta_color="normal" if co2_reduction > 0 else "inverse")
 
-            fig_reduction.add_trace(go.Bar(
-                name='Sp.Net_After',
-                x=['Sp.Net After'],
-                y=[sp_net_after],
-                marker_color='green',
-                text=[f"{sp_net_after:.6f}"],
-                textposition='auto'
-            ))
+            if net_before > 0:
+                reduction_pct = (co2_reduction / net_before * 100)
+            else:
+                reduction_pct = 0.0
 
-            fig_reduction.add_trace(go.Bar(
-                name='Primary Output After',
-                x=['Primary Output'],
-                y=[primary_output_after],
-                marker_color='orange',
-                text=[f"{primary_output_after:,.0f}"],
-                textposition='auto'
-            ))
+            col2.metric("Reduction %", f"{reduction_pct:.1f}%",
+                        delta=f"{reduction_pct:.1f}%" if reduction_pct > 0 else f"{reduction_pct:.1f}%",
+                        delta_color="normal" if reduction_pct > 0 else "inverse")
 
-            fig_reduction.update_layout(
-                title='CO₂ Reduction Calculation Components (Absolute Method)',
-                yaxis_title='Value',
-                template='plotly_white',
-                showlegend=True
-            )
+            col3.metric("Sp.Net Improvement", f"{sp_net_net_change:,.6f} tCO₂e/unit",
+                        delta=f"{sp_net_net_change:,.6f}" if sp_net_net_change > 0 else f"{sp_net_net_change:,.6f}",
+                        delta_color="normal" if sp_net_net_change > 0 else "inverse")
 
-        else:
-            fig_reduction.add_trace(go.Bar(
-                name='Sp.Net_Before',
-                x=['Sp.Net Before'],
-                y=[sp_net_before],
-                marker_color='blue',
-                text=[f"{sp_net_before:.6f}"],
-                textposition='auto'
-            ))
+            col4.metric("Method Used", project['calculation_method'].upper())
 
-            fig_reduction.add_trace(go.Bar(
-                name='Sp.Net_After',
-                x=['Sp.Net After'],
-                y=[sp_net_after],
-                marker_color='green',
-                text=[f"{sp_net_after:.6f}"],
-                textposition='auto'
-            ))
+            # Same numbers as the last rerun -> same figure object, no cache lookup or copy
+            fig = reuse_figure('_emission_fig', build_emission_analysis_fig,
+                               input_before, input_after, output_before, output_after,
+                               net_before, net_after, sp_net_before, sp_net_after, co2_reduction)
+            st.plotly_chart(fig, use_container_width=True)
 
-            fig_reduction.add_trace(go.Bar(
-                name='AMP After',
-                x=['AMP'],
-                y=[amp_after],
-                marker_color='purple',
-                text=[f"{amp_after:,.0f}"],
-                textposition='auto'
-            ))
+            fig_reduction = reuse_figure('_reduction_fig', build_reduction_components_fig,
+                                         is_absolute, sp_net_before, sp_net_after, primary_output_after, amp_after)
+            st.plotly_chart(fig_reduction, use_container_width=True)
 
-            fig_reduction.update_layout(
-                title='CO₂ Reduction Calculation Components (Specific Method)',
-                yaxis_title='Value',
-                template='plotly_white',
-                showlegend=True
-            )
+        except Exception as e:
+            st.error(f"❌ Calculation error: {str(e)}")
+            import traceback
+            st.error(f"Traceback: {traceback.format_exc()}")
+            st.info("Please check that all numeric fields have valid values.")
 
-        st.plotly_chart(fig_reduction, use_container_width=True)
+        return True
 
-    except Exception as e:
-        st.error(f"❌ Calculation error: {str(e)}")
-        import traceback
-        st.error(f"Traceback: {traceback.format_exc()}")
-        st.info("Please check that all numeric fields have valid values.")
+    if not emission_tables_and_results():
+        return
 
     # --- Tracking Section with Summary Table ---
-    with st.expander("📈 Track Project Actuals", expanded=False):
-        if project['project_code']:
+    # The expander reports its open state, so the DB reads and per-year tables only run while it is open
+    tracking_expander = st.expander("📈 Track Project Actuals", expanded=False, key="co2_tracking_expander",
+                                    on_change="rerun")
+    with tracking_expander:
+        if project['project_code'] and tracking_expander.open:
             try:
-                life_span = int(project['life_span']) if project['life_span'].isdigit() else 10
+                # Kept as an int by the Life Span input and on load
+                life_span = project['life_span']
 
-                conn = sqlite3.connect(CO2_DB_PATH)
+                # Shared cached connection (WAL); not closed here
+                conn = get_conn(CO2_DB_PATH)
                 cursor = conn.cursor()
 
                 # Store tracking data for calculations
                 year_data_store = {}
 
-                # Check if we have stored baseline calculations
-                baseline_values = {}
-                if 'emission_results_calculated' in project:
-                    baseline_values = project['emission_results_calculated']
-                else:
-                    # Calculate baseline values from project data
-                    amp_before = float(project['amp_before']) if is_specific else 1.0
-                    amp_after = float(project['amp_after']) if is_specific else 1.0
-
-                    # Calculate "After" values from Emission Results
-                    def calculate_after_values():
-                        total_input_after = 0.0
-                        total_output_after = 0.0
-
-                        # Calculate input emissions (After)
-                        for row in project['input_data']:
-                            ef = float(row.get('ef', 0.0))
-                            if is_absolute:
-                                abs_after = float(row.get('abs_after', 0.0))
-                                total_input_after += abs_after * ef
-                            else:
-                                spec_after = float(row.get('spec_after', 0.0))
-                                total_input_after += (amp_after * spec_after) * ef
-
-                        # Calculate output emissions (After)
-                        for row in project['output_data']:
-                            ef = float(row.get('ef', 0.0))
-                            if is_absolute:
-                                abs_after = float(row.get('abs_after', 0.0))
-                                total_output_after += abs_after * ef
-                            else:
-                                # For output in specific mode, spec_after is always 1
-                                total_output_after += (amp_after * 1.0) * ef
-
-                        net_after = total_input_after - total_output_after
-
-                        # Calculate Sp.Net (After)
-                        if is_absolute:
-                            if project['output_data'] and len(project['output_data']) > 0:
-                                primary_output_after = float(project['output_data'][0].get('abs_after', 0.0))
-                                sp_net_after = net_after / primary_output_after if primary_output_after != 0 else 0.0
-                            else:
-                                sp_net_after = 0.0
-                        else:  # specific
-                            sp_net_after = net_after / amp_after if amp_after != 0 else 0.0
-
-                        # Calculate CO₂ Reduction (Net Change value)
-                        # First calculate Before values
-                        total_input_before = 0.0
-                        total_output_before = 0.0
-
-                        # Calculate input emissions (Before)
-                        for row in project['input_data']:
-                            ef = float(row.get('ef', 0.0))
-                            if is_absolute:
-                                abs_before = float(row.get('abs_before', 0.0))
-                                total_input_before += abs_before * ef
-                            else:
-                                spec_before = float(row.get('spec_before', 0.0))
-                                total_input_before += (amp_before * spec_before) * ef
-
-                        # Calculate output emissions (Before)
-                        for row in project['output_data']:
-                            ef = float(row.get('ef', 0.0))
-                            if is_absolute:
-                                abs_before = float(row.get('abs_before', 0.0))
-                                total_output_before += abs_before * ef
-                            else:
-                                # For output in specific mode, spec_before is always 1
-                                total_output_before += (amp_before * 1.0) * ef
-
-                        net_before = total_input_before - total_output_before
-
-                        # Calculate Sp.Net (Before)
-                        if is_absolute:
-                            if project['output_data'] and len(project['output_data']) > 0:
-                                primary_output_before = float(project['output_data'][0].get('abs_before', 0.0))
-                                sp_net_before = net_before / primary_output_before if primary_output_before != 0 else 0.0
-                            else:
-                                sp_net_before = 0.0
-                        else:  # specific
-                            sp_net_before = net_before / amp_before if amp_before != 0 else 0.0
-
-                        # Calculate CO₂ Reduction
-                        if is_absolute:
-                            co2_reduction = (sp_net_before - sp_net_after) * primary_output_after
-                        else:  # specific
-                            co2_reduction = (sp_net_before - sp_net_after) * amp_after
-
-                        return {
-                            'input': total_input_after,
-                            'output': total_output_after,
-                            'net': net_after,
-                            'sp_net': sp_net_after,
-                            'co2_reduction': co2_reduction,
-                            'primary_output_after': primary_output_after if is_absolute else amp_after,
-                            'sp_net_before': sp_net_before
-                        }
-
-                    baseline_values = calculate_after_values()
-                    # Store for future use
-                    project['emission_results_calculated'] = baseline_values
-
-                # Get existing tracking years
-                cursor.execute(''' 
-                    SELECT DISTINCT year_number 
-                    FROM project_actuals 
-                    WHERE project_code = ? 
-                    UNION 
-                    SELECT DISTINCT year_number 
-                    FROM amp_actuals_tracking 
+                # Baseline ("After") values come from the Emission Results section above
+                baseline_values = project.get('emission_results_calculated', {})
+
+                # Year-independent row data, read once for all tabs: EF vectors and material names
+                input_rows = project.get('input_data', [])
+                output_rows = project.get('output_data', [])
+                input_ef_list = tuple(float(row.get('ef', 0.0)) for row in input_rows)
+                output_ef_list = tuple(float(row.get('ef', 0.0)) for row in output_rows)
+                input_materials = [row.get('material', f'Input {idx + 1}') for idx, row in enumerate(input_rows)]
+                output_materials = [row.get('material', f'Output {idx + 1}') for idx, row in enumerate(output_rows)]
+
+                # All saved actuals of the project, one query per table, split by year for the tabs.
+                # Per year: {'input': [(abs, spec), ...], 'output': [...]} aligned with the table rows.
+                def blank_year_defaults():
+                    return {'input': [(0.0, 0.0)] * len(input_rows), 'output': [(0.0, 0.0)] * len(output_rows)}
+
+                cursor.execute('''
+                    SELECT year_number, section_type, row_index, absolute_value, specific_value
+                    FROM project_actuals
                     WHERE project_code = ?
-                    ORDER BY year_number
-                ''', (project['project_code'], project['project_code']))
+                ''', (project['project_code'],))
+                defaults_by_year = {}
+                for year_number, section, row_idx, abs_val, spec_val in cursor.fetchall():
+                    year_defaults = defaults_by_year.get(year_number)
+                    if year_defaults is None:
+                        year_defaults = defaults_by_year[year_number] = blank_year_defaults()
+                    section_defaults = year_defaults.get(section)
+                    if section_defaults is not None and isinstance(row_idx, int) and 0 <= row_idx < len(section_defaults):
+                        # Unsaved side of a row (NULL) shows as 0.0
+                        section_defaults[row_idx] = (abs_val if abs_val is not None else 0.0,
+                                                     spec_val if spec_val is not None else 0.0)
+
+                cursor.execute('''
+                    SELECT year_number, amp_value FROM amp_actuals_tracking
+                    WHERE project_code = ?
+                ''', (project['project_code'],))
+                amp_by_year = dict(cursor.fetchall())
+
+                # Tracking years: the life span plus any other year that already has saved actuals or AMP
+                # (union1d: one sorted, de-duplicated pass; .tolist() keeps plain ints for the tabs)
+                existing_years = np.fromiter(
+                    (year for year in (*defaults_by_year, *amp_by_year) if isinstance(year, int)), dtype=np.int64)
+                all_years = np.union1d(np.arange(1, life_span + 1, dtype=np.int64), existing_years).tolist()
+
+                # --- Year entry renderers, one per method so the row loops don't branch ---
+                # Each returns (entered values, rows the year's "Save Year" submit writes).
+                def input_rows_absolute(year, defaults):
+                    values, actual_rows = [], []
+                    for idx, material in enumerate(input_materials):
+                        abs_val = st.number_input(
+                            f"{material} - Absolute Value",
+                            value=float(defaults[idx][0]),
+                            step=0.01,
+                            key=f"track_in_abs_{idx}_y{year}"
+                        )
+                        # Specific value is None for absolute calculations
+                        values.append(abs_val)
+                        actual_rows.append((project['project_code'], 'input', material, idx, year, abs_val, None))
+                    return values, actual_rows
+
+                def input_rows_specific(year, defaults):
+                    values, actual_rows = [], []
+                    for idx, material in enumerate(input_materials):
+                        spec_val = st.number_input(
+                            f"{material} - Specific Value",
+                            value=float(defaults[idx][1]),
+                            step=0.01,
+                            key=f"track_in_spec_{idx}_y{year}"
+                        )
+                        # Absolute value is None for specific calculations
+                        values.append(spec_val)
+                        actual_rows.append((project['project_code'], 'input', material, idx, year, None, spec_val))
+                    return values, actual_rows
+
+                def output_rows_absolute(year, defaults):
+                    values, actual_rows = [], []
+                    for idx, material in enumerate(output_materials):
+                        abs_val = st.number_input(
+                            f"{material} - Absolute Value",
+                            value=float(defaults[idx][0]),
+                            step=0.01,
+                            key=f"track_out_abs_{idx}_y{year}"
+                        )
+                        values.append(abs_val)
+                        actual_rows.append((project['project_code'], 'output', material, idx, year, abs_val, None))
+                    return values, actual_rows
+
+                def output_rows_specific(year, defaults):
+                    # For output in specific mode, values are fixed at 1
+                    values, actual_rows = [], []
+                    for idx, material in enumerate(output_materials):
+                        st.text_input(
+                            f"{material} - Specific Value",
+                            value="1.00",
+                            disabled=True,
+                            key=f"track_out_spec_{idx}_y{year}"
+                        )
+                        # Absolute Before = 1 for the first output row, Specific After = 1
+                        values.append(1.0)
+                        actual_rows.append((project['project_code'], 'output', material, idx, year,
+                                            1.0 if idx == 0 else None, 1.0))
+                    return values, actual_rows
 
-                existing_years = [row[0] for row in cursor.fetchall()]
-                all_years = list(range(1, life_span + 1)) + existing_years
-                all_years = sorted(set(all_years))
+                render_input_rows = input_rows_absolute if is_absolute else input_rows_specific
+                render_output_rows = output_rows_absolute if is_absolute else output_rows_specific
 
                 # Create tabs for each year
                 if all_years:
@@ -4593,237 +4805,56 @@ def co2_project_calculator_ui():
                             year = all_years[y_idx]
                             st.markdown(f"### 📅 Enter Data for Year {year}")
 
-                            # Load existing values
-                            cursor.execute(''' 
-                                SELECT section_type, material_name, row_index, absolute_value, specific_value 
-                                FROM project_actuals 
-                                WHERE project_code = ? AND year_number = ?
-                            ''', (project['project_code'], year))
-
-                            existing_values = {}
-                            for section, material, row_idx, abs_val, spec_val in cursor.fetchall():
-                                key = f"{section}_{row_idx}"
-                                existing_values[key] = {'abs': abs_val, 'spec': spec_val}
-
-                            # Load existing AMP
-                            cursor.execute(''' 
-                                SELECT amp_value FROM amp_actuals_tracking 
-                                WHERE project_code = ? AND year_number = ?
-                            ''', (project['project_code'], year))
-
-                            amp_row = cursor.fetchone()
-                            default_amp = amp_row[0] if amp_row else 0.0
-
-                            # Track current year values
-                            current_input_values = []
-                            current_output_values = []
-                            current_amp_value = 0.0
-
-                            # Get EF values from project data
-                            input_ef_list = [float(row.get('ef', 0.0)) for row in project.get('input_data', [])]
-                            output_ef_list = [float(row.get('ef', 0.0)) for row in project.get('output_data', [])]
-
-                            # Input Data Entry
-                            st.markdown("**Input Data**")
-                            input_data_updated = False
-
-                            for idx, row in enumerate(project.get('input_data', [])):
-                                material = row.get('material', f'Input {idx + 1}')
-                                key = f"input_{idx}"
-
-                                default_abs = existing_values.get(key, {}).get('abs', 0.0)
-                                default_spec = existing_values.get(key, {}).get('spec', 0.0)
-
-                                col1, col2 = st.columns([3, 1])
+                            # Existing values and AMP for this year
+                            year_defaults = defaults_by_year.get(year) or blank_year_defaults()
+                            default_amp = amp_by_year.get(year, 0.0)
 
-                                if is_absolute:
-                                    # For absolute calculations: Enter Absolute value
-                                    with col1:
-                                        abs_val = st.number_input(
-                                            f"{material} - Absolute Value",
-                                            value=float(default_abs),
-                                            step=0.01,
-                                            key=f"track_in_abs_{idx}_y{year}"
-                                        )
-                                        current_input_values.append(abs_val)
-
-                                    with col2:
-                                        if st.button(f"💾", key=f"save_in_{idx}_y{year}", help=f"Save {material}"):
-                                            cursor.execute(''' 
-                                                INSERT OR REPLACE INTO project_actuals 
-                                                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                                                VALUES (?, 'input', ?, ?, ?, ?, ?)
-                                            ''', (
-                                                project['project_code'],
-                                                material,
-                                                idx,
-                                                year,
-                                                abs_val,
-                                                None  # Specific value is None for absolute calculations
-                                            ))
-                                            conn.commit()
-                                            input_data_updated = True
-                                else:
-                                    # For specific calculations: Enter Specific value
-                                    with col1:
-                                        spec_val = st.number_input(
-                                            f"{material} - Specific Value",
-                                            value=float(default_spec),
-                                            step=0.01,
-                                            key=f"track_in_spec_{idx}_y{year}"
-                                        )
-                                        current_input_values.append(spec_val)
-
-                                    with col2:
-                                        if st.button(f"💾", key=f"save_in_{idx}_y{year}", help=f"Save {material}"):
-                                            cursor.execute(''' 
-                                                INSERT OR REPLACE INTO project_actuals 
-                                                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                                                VALUES (?, 'input', ?, ?, ?, ?, ?)
-                                            ''', (
-                                                project['project_code'],
-                                                material,
-                                                idx,
-                                                year,
-                                                None,  # Absolute value is None for specific calculations
-                                                spec_val
-                                            ))
-                                            conn.commit()
-                                            input_data_updated = True
-
-                            # Output Data Entry
-                            st.markdown("**Output Data**")
-                            output_data_updated = False
-
-                            for idx, row in enumerate(project.get('output_data', [])):
-                                material = row.get('material', f'Output {idx + 1}')
-                                key = f"output_{idx}"
-
-                                default_abs = existing_values.get(key, {}).get('abs', 0.0)
-                                default_spec = existing_values.get(key, {}).get('spec', 0.0)
-
-                                col1, col2 = st.columns([3, 1])
+                            current_amp_value = 0.0
 
-                                if is_absolute:
-                                    # For absolute calculations: Enter Absolute value
-                                    with col1:
-                                        abs_val = st.number_input(
-                                            f"{material} - Absolute Value",
-                                            value=float(default_abs),
-                                            step=0.01,
-                                            key=f"track_out_abs_{idx}_y{year}"
-                                        )
-                                        current_output_values.append(abs_val)
-
-                                    with col2:
-                                        if st.button(f"💾", key=f"save_out_{idx}_y{year}", help=f"Save {material}"):
-                                            cursor.execute(''' 
-                                                INSERT OR REPLACE INTO project_actuals 
-                                                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                                                VALUES (?, 'output', ?, ?, ?, ?, ?)
-                                            ''', (
-                                                project['project_code'],
-                                                material,
-                                                idx,
-                                                year,
-                                                abs_val,
-                                                None  # Specific value is None for absolute calculations
-                                            ))
-                                            conn.commit()
-                                            output_data_updated = True
-                                else:
-                                    # For output in specific mode, values are fixed at 1
-                                    with col1:
-                                        st.text_input(
-                                            f"{material} - Specific Value",
-                                            value="1.00",
-                                            disabled=True,
-                                            key=f"track_out_spec_{idx}_y{year}"
-                                        )
-                                        current_output_values.append(1.0)  # Fixed at 1 for specific
-
-                                    with col2:
-                                        if st.button(f"💾", key=f"save_out_{idx}_y{year}", help=f"Save {material}"):
-                                            cursor.execute(''' 
-                                                INSERT OR REPLACE INTO project_actuals 
-                                                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                                                VALUES (?, 'output', ?, ?, ?, ?, ?)
-                                            ''', (
-                                                project['project_code'],
-                                                material,
-                                                idx,
-                                                year,
-                                                1.0 if idx == 0 else None,  # Absolute Before = 1 for first output row
-                                                1.0  # Specific After = 1
-                                            ))
-                                            conn.commit()
-                                            output_data_updated = True
-
-                            # AMP Entry (only for specific calculations)
-                            amp_updated = False
-                            if is_specific:
-                                st.markdown("**Annual Material Production (AMP)**")
-
-                                col1, col2 = st.columns([3, 1])
-                                with col1:
-                                    amp_val = st.number_input(
+                            # Entries are only sent on "Save Year", so typing doesn't rerun the page
+                            with st.form(key=f"year_form_{year}"):
+                                # Input & Output Data Entry (method-specific renderers picked once above)
+                                st.markdown("**Input Data**")
+                                current_input_values, input_actual_rows = render_input_rows(
+                                    year, year_defaults['input'])
+
+                                st.markdown("**Output Data**")
+                                current_output_values, output_actual_rows = render_output_rows(
+                                    year, year_defaults['output'])
+
+                                # AMP Entry (only for specific calculations)
+                                if is_specific:
+                                    st.markdown("**Annual Material Production (AMP)**")
+                                    current_amp_value = st.number_input(
                                         f"AMP Value ({project['amp_uom']})",
                                         value=float(default_amp),
                                         step=0.01,
                                         key=f"track_amp_y{year}"
                                     )
-                                    current_amp_value = amp_val
-
-                                with col2:
-                                    if st.button(f"💾 AMP", key=f"save_amp_y{year}", help="Save AMP"):
-                                        cursor.execute(''' 
-                                            INSERT OR REPLACE INTO amp_actuals_tracking 
-                                            (project_code, year_number, amp_value)
-                                            VALUES (?, ?, ?)
-                                        ''', (project['project_code'], year, amp_val))
-                                        conn.commit()
-                                        amp_updated = True
-                            else:
-                                # For absolute calculations, AMP is not applicable
-                                current_amp_value = 1.0
-                                st.info("AMP tracking is only applicable for specific calculations.")
-
-                            # Show save success messages
-                            if input_data_updated or output_data_updated or amp_updated:
+                                else:
+                                    # For absolute calculations, AMP is not applicable
+                                    current_amp_value = 1.0
+                                    st.info("AMP tracking is only applicable for specific calculations.")
+
+                                submitted = st.form_submit_button("💾 Save Year")
+
+                            # Save every entry of this year in one transaction
+                            if submitted:
+                                with write_txn(conn):
+                                    cursor.executemany(SQL_SAVE_PROJECT_ACTUAL, input_actual_rows + output_actual_rows)
+                                    if is_specific:
+                                        cursor.execute(SQL_SAVE_AMP_ACTUAL,
+                                                       (project['project_code'], year, current_amp_value))
                                 st.success(f"✅ Data saved for Year {year}")
                                 st.rerun()
 
                             # ========== CALCULATE YEARLY CO₂ REDUCTION ==========
                             if current_input_values and current_output_values and len(current_input_values) == len(
                                     input_ef_list) and len(current_output_values) == len(output_ef_list):
-
-                                def calculate_tracking_emissions(input_values, output_values, amp_value):
-                                    """Calculate emissions for tracking based on actual values"""
-                                    total_input_emission = 0.0
-                                    total_output_emission = 0.0
-
-                                    if is_absolute:
-                                        # Absolute calculation
-                                        for i, (input_val, input_ef) in enumerate(zip(input_values, input_ef_list)):
-                                            total_input_emission += input_val * input_ef
-
-                                        for i, (output_val, output_ef) in enumerate(zip(output_values, output_ef_list)):
-                                            total_output_emission += output_val * output_ef
-                                    else:
-                                        # Specific calculation
-                                        for i, (input_val, input_ef) in enumerate(zip(input_values, input_ef_list)):
-                                            total_input_emission += (amp_value * input_val) * input_ef
-
-                                        for i, (output_val, output_ef) in enumerate(zip(output_values, output_ef_list)):
-                                            # For output in specific mode, values are fixed at 1
-                                            total_output_emission += (amp_value * 1.0) * output_ef
-
-                                    net_emission = total_input_emission - total_output_emission
-                                    return total_input_emission, total_output_emission, net_emission
-
-                                # Calculate emissions for this year
-                                year_input_emission, year_output_emission, year_net_emission = calculate_tracking_emissions(
-                                    current_input_values, current_output_values, current_amp_value
+                                # Calculate emissions for this year (memoised: unchanged tabs are a cache hit)
+                                year_input_emission, year_output_emission, year_net_emission = tracking_emissions(
+                                    tuple(current_input_values), tuple(current_output_values), current_amp_value,
+                                    is_absolute, input_ef_list, output_ef_list
                                 )
 
                                 # Calculate Sp.Net for this year
@@ -4876,166 +4907,172 @@ def co2_project_calculator_ui():
                     st.markdown("---")
                     st.markdown("### 📋 CO₂ Reduction Tracking Summary")
 
-                    # Create simple summary table with only CO₂ Reduction
-                    summary_headers = ["Period", "CO₂ Reduction (tCO₂e)"]
-                    summary_rows = []
-
-                    # Add Baseline row
-                    summary_rows.append([
-                        "Base",
-                        f"{baseline_values.get('co2_reduction', 0):,.2f}"
-                    ])
-
-                    # Add rows for years 1 to life_span
-                    for year in range(1, life_span + 1):
-                        if year in year_data_store:
-                            # Year has data - show actual CO₂ Reduction
-                            data = year_data_store[year]
-                            summary_rows.append([
-                                f"{year}-Year",
-                                f"{data['co2_reduction']:,.2f}"
-                            ])
-                        else:
-                            # Year has no data yet - show blank/placeholder
-                            summary_rows.append([
-                                f"{year}-Year",
-                                ""  # Blank until data is entered
-                            ])
-
-                    # Create DataFrame
-                    summary_df = pd.DataFrame(summary_rows, columns=summary_headers)
-
-                    # Display summary table
-                    st.dataframe(
-                        summary_df,
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            "Period": st.column_config.TextColumn("Period", width="medium"),
-                            "CO₂ Reduction (tCO₂e)": st.column_config.TextColumn("CO₂ Reduction (tCO₂e)", width="large")
-                        }
-                    )
-
-                    # Calculate totals and averages only for years with data
-                    years_with_data = [year for year in range(1, life_span + 1) if year in year_data_store]
-
-                    if years_with_data:
-                        # Calculate metrics
-                        baseline_reduction = baseline_values.get('co2_reduction', 0)
-                        actual_reductions = [year_data_store[year]['co2_reduction'] for year in years_with_data]
-                        total_actual_reduction = sum(actual_reductions)
-                        avg_actual_reduction = total_actual_reduction / len(
-                            actual_reductions) if actual_reductions else 0
-
-                        # Calculate cumulative vs baseline
-                        cumulative_baseline = baseline_reduction * len(years_with_data)
-                        cumulative_actual = sum(actual_reductions)
-                        cumulative_difference = cumulative_actual - cumulative_baseline
-
-                        # Display key metrics
-                        col1, col2, col3, col4 = st.columns(4)
-                        col1.metric("Years with Data", len(years_with_data))
-                        col2.metric("Baseline Reduction", f"{baseline_reduction:,.2f} tCO₂e")
-                        col3.metric("Average Actual", f"{avg_actual_reduction:,.2f} tCO₂e")
-                        col4.metric("Cumulative Δ", f"{cumulative_difference:+,.2f} tCO₂e",
-                                    delta_color="normal" if cumulative_difference > 0 else "inverse")
-
-                        # Visual chart - CO₂ Reduction trend
-                        years_for_chart = ["Base"] + [f"Year {y}" for y in years_with_data]
-                        reduction_values = [baseline_reduction] + actual_reductions
-
-                        fig = go.Figure()
-
-                        # Add line for baseline
-                        fig.add_trace(go.Scatter(
-                            x=years_for_chart,
-                            y=reduction_values,
-                            mode='lines+markers+text',
-                            name='CO₂ Reduction',
-                            line=dict(color='blue', width=2),
-                            marker=dict(size=10),
-                            text=[f"{val:,.0f}" for val in reduction_values],
-                            textposition='top center'
-                        ))
-
-                        # Add horizontal line for baseline
-                        fig.add_hline(
-                            y=baseline_reduction,
-                            line_dash="dash",
-                            line_color="gray",
-                            annotation_text=f"Baseline: {baseline_reduction:,.0f}",
-                            annotation_position="bottom right"
-                        )
-
-                        fig.update_layout(
-                            title="CO₂ Reduction Trend",
-                            xaxis_title="Period",
-                            yaxis_title="CO₂ Reduction (tCO₂e)",
-                            template="plotly_white",
-                            showlegend=True
+                    # Summary, chart and CSV are only built once asked for, so year entry stays light
+                    # (a checkbox, as expanders can't be nested inside the tracking expander)
+                    if st.checkbox("Show summary", key="co2_tracking_show_summary"):
+                        # Create simple summary table with only CO₂ Reduction
+                        summary_headers = ["Period", "CO₂ Reduction (tCO₂e)"]
+                        summary_rows = []
+
+                        # Add Baseline row
+                        summary_rows.append([
+                            "Base",
+                            f"{baseline_values.get('co2_reduction', 0):,.2f}"
+                        ])
+
+                        # Add rows for years 1 to life_span
+                        for year in range(1, life_span + 1):
+                            if year in year_data_store:
+                                # Year has data - show actual CO₂ Reduction
+                                data = year_data_store[year]
+                                summary_rows.append([
+                                    f"{year}-Year",
+                                    f"{data['co2_reduction']:,.2f}"
+                                ])
+                            else:
+                                # Year has no data yet - show blank/placeholder
+                                summary_rows.append([
+                                    f"{year}-Year",
+                                    ""  # Blank until data is entered
+                                ])
+
+                        # Create DataFrame
+                        summary_df = pd.DataFrame(summary_rows, columns=summary_headers)
+
+                        # Display summary table
+                        st.dataframe(
+                            summary_df,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "Period": st.column_config.TextColumn("Period", width="medium"),
+                                "CO₂ Reduction (tCO₂e)": st.column_config.TextColumn("CO₂ Reduction (tCO₂e)", width="large")
+                            }
                         )
 
-                        st.plotly_chart(fig, use_container_width=True)
+                        # Calculate totals and averages only for years with data
+                        years_with_data = [year for year in range(1, life_span + 1) if year in year_data_store]
+
+                        if years_with_data:
+                            # Calculate metrics
+                            baseline_reduction = baseline_values.get('co2_reduction', 0)
+                            actual_reductions = np.fromiter(
+                                (year_data_store[year]['co2_reduction'] for year in years_with_data),
+                                dtype=np.float64, count=len(years_with_data))
+                            total_actual_reduction = float(actual_reductions.sum())
+                            avg_actual_reduction = float(actual_reductions.mean())
+
+                            # Calculate cumulative vs baseline
+                            cumulative_difference = total_actual_reduction - baseline_reduction * actual_reductions.size
+
+                            # Display key metrics
+                            col1, col2, col3, col4 = st.columns(4)
+                            col1.metric("Years with Data", len(years_with_data))
+                            col2.metric("Baseline Reduction", f"{baseline_reduction:,.2f} tCO₂e")
+                            col3.metric("Average Actual", f"{avg_actual_reduction:,.2f} tCO₂e")
+                            col4.metric("Cumulative Δ", f"{cumulative_difference:+,.2f} tCO₂e",
+                                        delta_color="normal" if cumulative_difference > 0 else "inverse")
+
+                            # Visual chart - CO₂ Reduction trend (rebuilt only when its numbers change)
+                            if st.checkbox("Show chart", key="co2_tracking_show_chart"):
+                                fig = reuse_figure('_tracking_trend_fig', build_tracking_trend_fig,
+                                                   tuple(years_with_data), tuple(actual_reductions.tolist()),
+                                                   float(baseline_reduction))
+
+                                st.plotly_chart(fig, use_container_width=True)
+
+                            # Export option (written straight from the summary rows, not the DataFrame)
+                            csv_data = to_csv_text(summary_headers, summary_rows)
+                            st.download_button(
+                                label="📥 Download CO₂ Reduction Summary as CSV",
+                                data=csv_data,
+                                file_name=f"{project['project_name']}_co2_reduction_summary.csv",
+                                mime="text/csv",
+                                key="download_co2_reduction_summary"
+                            )
 
-                        # Export option
-                        csv = summary_df.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download CO₂ Reduction Summary as CSV",
-                            data=csv,
-                            file_name=f"{project['project_name']}_co2_reduction_summary.csv",
-                            mime="text/csv",
-                            key="download_co2_reduction_summary"
-                        )
-
-                    else:
-                        st.info("Enter data for at least one year to see summary metrics and charts.")
+                        else:
+                            st.info("Enter data for at least one year to see summary metrics and charts.")
 
                 else:
                     st.info("No tracking years available yet. Save the project first.")
 
-                conn.close()
-
             except Exception as e:
                 st.error(f"❌ Tracking error: {str(e)}")
                 import traceback
                 st.error(f"Traceback: {traceback.format_exc()}")
-        else:
+        elif not project['project_code']:
             st.info("💡 Save the project first to enable tracking.")
+# Row/column layout of the results popup; results dicts are keyed "<parameter>_<column>"
+RESULT_COLUMNS = ("Before", "After", "Net")
+EMISSION_RESULT_ROWS = ("Input CO2", "Output CO2", "Net CO2", "Sp.Net")
+EMISSION_RESULT_UOMS = ("kg", "kg", "kg", "kg/tp", "kg")
+COSTING_RESULT_ROWS = ("OPEX Cost (Excluding Fuel and Energy)", "OPEX Cost (Only Fuel and Energy)")
+
+
+def result_values(results, parameters):
+    """(len(parameters), 3) float64 Before/After/Net array read from a results dict in one pass"""
+    return np.array([[results[f"{parameter}_{column}"] for column in RESULT_COLUMNS] for parameter in parameters],
+                    dtype=np.float64)
+
+
 def show_results_popup(emission_results, costing_results, method):
     with st.expander("📊 Calculation Results", expanded=True):
         st.markdown(f"### Results ({method.capitalize() if method else 'Not Selected'} Method)")
-        em_data = {
-            "Parameter": ["Input CO2", "Output CO2", "Net CO2", "Sp.Net", "CO2 reduction"],
-            "UOM": ["kg", "kg", "kg", "kg/tp", "kg"],
-            "Before": [emission_results["Input CO2_Before"], emission_results["Output CO2_Before"], emission_results["Net CO2_Before"], emission_results["Sp.Net_Before"], ""],
-            "After": [emission_results["Input CO2_After"], emission_results["Output CO2_After"], emission_results["Net CO2_After"], emission_results["Sp.Net_After"], ""],
-            "Net": [emission_results["Input CO2_Net"], emission_results["Output CO2_Net"], emission_results["Net CO2_Net"], emission_results["Sp.Net_Net"], emission_results["CO2 reduction_Net"]]
-        }
-        st.dataframe(pd.DataFrame(em_data), use_container_width=True, hide_index=True)
-
-        cost_data = {
-            "Parameter": ["OPEX Cost (Excluding Fuel and Energy)", "OPEX Cost (Only Fuel and Energy)"],
-            "UOM": ["INR", "INR"],
-            "Before": [costing_results["OPEX Cost (Excluding Fuel and Energy)_Before"], costing_results["OPEX Cost (Only Fuel and Energy)_Before"]],
-            "After": [costing_results["OPEX Cost (Excluding Fuel and Energy)_After"], costing_results["OPEX Cost (Only Fuel and Energy)_After"]],
-            "Net": [costing_results["OPEX Cost (Excluding Fuel and Energy)_Net"], costing_results["OPEX Cost (Only Fuel and Energy)_Net"]]
-        }
-        st.dataframe(pd.DataFrame(cost_data), use_container_width=True, hide_index=True)
-def load_project_data(code):
-    conn = sqlite3.connect(PROJECT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM projects WHERE project_code = ?", (code,))
-    row = cursor.fetchone()
+        # CO2 reduction only has a Net value (Before/After shown blank)
+        em_values = np.vstack((result_values(emission_results, EMISSION_RESULT_ROWS),
+                               (np.nan, np.nan, float(emission_results["CO2 reduction_Net"]))))
+        em_df = pd.DataFrame(em_values, columns=RESULT_COLUMNS)
+        em_df.insert(0, "Parameter", EMISSION_RESULT_ROWS + ("CO2 reduction",))
+        em_df.insert(1, "UOM", EMISSION_RESULT_UOMS)
+        # Small read-only tables: static st.table instead of the interactive grid
+        st.table(em_df.set_index("Parameter").style.format(na_rep=""))
+
+        cost_df = pd.DataFrame(result_values(costing_results, COSTING_RESULT_ROWS), columns=RESULT_COLUMNS)
+        cost_df.insert(0, "Parameter", COSTING_RESULT_ROWS)
+        cost_df.insert(1, "UOM", "INR")
+        st.table(cost_df.set_index("Parameter"))
+
+
+# projects columns load_project_data copies into project_state, selected by name (no SELECT * / PRAGMA)
+PROJECT_STATE_FIELDS = (
+    "calculation_method", "organization", "entity_name", "unit_name", "project_name", "base_year",
+    "target_year", "implementation_date", "capex", "life_span", "project_owner",
+    "input_data", "output_data", "costing_data", "amp_uom", "amp_before", "amp_after",
+)
+SQL_LOAD_PROJECT_STATE = f"SELECT {', '.join(PROJECT_STATE_FIELDS)} FROM projects WHERE project_code = ?"
+SQL_PROJECT_UPDATED_AT = "SELECT updated_at FROM projects WHERE project_code = ?"
+# Rows used when a project has no saved output / costing table (copied per load, never parsed)
+_DEFAULT_OUTPUT_ROWS = (("Primary Output", "", "", "", "1", "1", ""),)
+_DEFAULT_COSTING_ROWS = (
+    ("OPEX Cost (Excluding Fuel and Energy)", "INR", "", "", "", ""),
+    ("OPEX Cost (Only Fuel and Energy)", "INR", "", "", "", ""),
+)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def fetch_project_state(db_path, code, updated_at):
+    """{field: value} of a projects row with its JSON rows decoded; cached until the row's updated_at changes"""
+    row = get_conn(db_path).execute(SQL_LOAD_PROJECT_STATE, (code,)).fetchone()
     if not row:
-        conn.close()
+        return None
+    data = dict(zip(PROJECT_STATE_FIELDS, row))
+    data['input_data'] = rows_from_json(data['input_data']) if data.get('input_data') else []
+    data['output_data'] = (rows_from_json(data['output_data']) if data.get('output_data')
+                           else [list(row) for row in _DEFAULT_OUTPUT_ROWS])
+    data['costing_data'] = (rows_from_json(data['costing_data']) if data.get('costing_data')
+                            else [list(row) for row in _DEFAULT_COSTING_ROWS])
+    return data
+
+
+def load_project_data(code):
+    # Only the row's updated_at is read here; the full row + JSON decode is a cache hit until it changes
+    stamp = get_conn(PROJECT_DB_PATH).execute(SQL_PROJECT_UPDATED_AT, (code,)).fetchone()
+    data = fetch_project_state(PROJECT_DB_PATH, code, stamp[0]) if stamp else None
+    if not data:
         st.error("Project not found")
         return
 
-    cursor.execute("PRAGMA table_info(projects)")
-    columns = [info[1] for info in cursor.fetchall()]
-    data = dict(zip(columns, row))
-    conn.close()
-
     state = st.session_state.project_state
     state['current_project_code'] = code
     state['calculation_method'] = data.get('calculation_method')
@@ -5055,9 +5092,9 @@ def load_project_data(code):
     for label, field in mapping.items():
         state['general_info'][label] = data.get(field) or ""
 
-    state['input_rows'] = json.loads(data.get('input_data') or "[]")
-    state['output_rows'] = json.loads(data.get('output_data') or '[["Primary Output","","","","1","1",""]]')
-    state['costing_rows'] = json.loads(data.get('costing_data') or '[["OPEX Cost (Excluding Fuel and Energy)","INR","","","",""],["OPEX Cost (Only Fuel and Energy)","INR","","","",""]]')
+    state['input_rows'] = data['input_data']
+    state['output_rows'] = data['output_data']
+    state['costing_rows'] = data['costing_data']
     state['amp_uom'] = data.get('amp_uom') or "kg"
     state['amp_before'] = str(data.get('amp_before') or "")
     state['amp_after'] = str(data.get('amp_after') or "")
@@ -5065,18 +5102,29 @@ def load_project_data(code):
     st.rerun()
 def show_tracking_dialog(project_code):
     st.subheader(f"📈 Track Actuals – {project_code}")
-    conn = sqlite3.connect(PROJECT_DB_PATH)
+    conn = get_conn(PROJECT_DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("SELECT input_data, output_data FROM projects WHERE project_code = ?", (project_code,))
-    proj = cursor.fetchone()
-    if not proj:
-        st.error("Project data not found")
-        return
-    input_data = json.loads(proj[0])
-    output_data = json.loads(proj[1])
-
-    years = sorted(set([r[0] for r in cursor.execute("SELECT DISTINCT year_number FROM project_actuals WHERE project_code = ?", (project_code,)).fetchall()] +
-                      [r[0] for r in cursor.execute("SELECT DISTINCT year_number FROM amp_actuals_tracking WHERE project_code = ?", (project_code,)).fetchall()]))
+    # Rows of the project load_project_data put in project_state; the DB is only read on a cold entry
+    state = st.session_state.get('project_state') or {}
+    if state.get('current_project_code') == project_code:
+        input_data, output_data = state['input_rows'], state['output_rows']
+    else:
+        cursor.execute("SELECT input_data, output_data FROM projects WHERE project_code = ?", (project_code,))
+        proj = cursor.fetchone()
+        if not proj:
+            st.error("Project data not found")
+            return
+        input_data = json.loads(proj[0])
+        output_data = json.loads(proj[1])
+
+    # Years with saved actuals or AMP; UNION dedupes and ORDER BY sorts in SQLite (one round trip)
+    cursor.execute('''
+        SELECT year_number FROM project_actuals WHERE project_code = ?
+        UNION
+        SELECT year_number FROM amp_actuals_tracking WHERE project_code = ?
+        ORDER BY year_number
+    ''', (project_code, project_code))
+    years = [r[0] for r in cursor.fetchall()]
 
     year = st.selectbox("Year", ["New Year"] + years, key="track_year_select")
     if year == "New Year":
@@ -5084,47 +5132,81 @@ def show_tracking_dialog(project_code):
         if not st.button("Create Year", key="create_year_btn"):
             st.stop()
 
-    for idx, row in enumerate(input_data):
-        material = row[0] or f"Input {idx+1}"
-        st.markdown(f"**{material}**")
-        c1, c2 = st.columns(2)
-        abs_v = c1.number_input("Absolute Value", min_value=0.0, key=f"track_in_abs_{idx}_{year}")
-        spec_v = c2.number_input("Specific Value", min_value=0.0, key=f"track_in_spec_{idx}_{year}")
-        if st.button("Save", key=f"track_save_in_{idx}_{year}"):
-            cursor.execute('''
-                INSERT OR REPLACE INTO project_actuals 
-                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                VALUES (?, 'input', ?, ?, ?, ?, ?)
-            ''', (project_code, material, idx, year, abs_v or None, spec_v or None))
-            conn.commit()
-            st.success("Saved")
-
-    for idx, row in enumerate(output_data):
-        material = row[0] or f"Output {idx+1}"
-        st.markdown(f"**{material}**")
-        c1, c2 = st.columns(2)
-        abs_v = c1.number_input("Absolute Value", min_value=0.0, key=f"track_out_abs_{idx}_{year}")
-        spec_v = c2.number_input("Specific Value", min_value=0.0, key=f"track_out_spec_{idx}_{year}")
-        if st.button("Save", key=f"track_save_out_{idx}_{year}"):
-            cursor.execute('''
-                INSERT OR REPLACE INTO project_actuals 
-                (project_code, section_type, material_name, row_index, year_number, absolute_value, specific_value)
-                VALUES (?, 'output', ?, ?, ?, ?, ?)
-            ''', (project_code, material, idx, year, abs_v or None, spec_v or None))
-            conn.commit()
-            st.success("Saved")
+    # One grid for every input/output row of the year, prefilled with its saved actuals.
+    # The year's grid frame is kept in track_cache until it is committed, so reruns and year switches
+    # reuse it instead of re-reading SQLite. The grid is keyed per project/year: a keyed fixed-row
+    # editor's identity is its key + schema/row count, not its data, so a shared key would carry one
+    # year's unsaved edits into another year's frame. The AMP input is keyed the same way, since a
+    # keyed number_input ignores a changed value= and would show another project's AMP.
+    grid_key = f"track_grid_{project_code}_{year}"
+    amp_key = f"track_amp_{project_code}_{year}"
+    value_cols = ['absolute_value', 'specific_value']
+    track_cache = st.session_state.setdefault('track_cache', {})
+    original = track_cache.get((project_code, year))
+    if original is None:
+        cursor.execute('''
+            SELECT section_type, row_index, absolute_value, specific_value FROM project_actuals
+            WHERE project_code = ? AND year_number = ?
+        ''', (project_code, year))
+        saved = {(section, idx): (abs_v, spec_v) for section, idx, abs_v, spec_v in cursor.fetchall()}
+        grid_rows = []
+        for section, rows, label in (('input', input_data, "Input"), ('output', output_data, "Output")):
+            for idx, row in enumerate(rows):
+                abs_v, spec_v = saved.get((section, idx), (None, None))
+                grid_rows.append((section, idx, row[0] or f"{label} {idx+1}", abs_v, spec_v))
+        original = pd.DataFrame(grid_rows, columns=['section', 'row_index', 'material'] + value_cols)
+        original[value_cols] = original[value_cols].astype(float)
+        track_cache[(project_code, year)] = original
+
+    edited = st.data_editor(
+        original,
+        key=grid_key,
+        num_rows="fixed",
+        hide_index=True,
+        use_container_width=True,
+        column_order=('section', 'material', 'absolute_value', 'specific_value'),
+        disabled=('section', 'material'),
+        column_config={
+            'section': st.column_config.TextColumn("Section"),
+            'material': st.column_config.TextColumn("Material"),
+            'absolute_value': st.column_config.NumberColumn("Absolute Value", min_value=0.0),
+            'specific_value': st.column_config.NumberColumn("Specific Value", min_value=0.0),
+        }
+    )
 
     st.markdown("**AMP Actual**")
-    amp_v = st.number_input("AMP Value", min_value=0.0, key=f"track_amp_{year}")
-    if st.button("Save AMP", key="save_amp_btn"):
-        cursor.execute("INSERT OR REPLACE INTO amp_actuals_tracking (project_code, year_number, amp_value) VALUES (?, ?, ?)",
-                       (project_code, year, amp_v or None))
-        conn.commit()
-        st.success("Saved")
-
-    conn.close()
+    cursor.execute("SELECT amp_value FROM amp_actuals_tracking WHERE project_code = ? AND year_number = ?",
+                   (project_code, year))
+    saved_amp = (cursor.fetchone() or (None,))[0]
+    amp_v = st.number_input("AMP Value", min_value=0.0, value=float(saved_amp or 0.0), key=amp_key)
+
+    # The grid edits and the AMP stay pending in their widgets until committed together
+    if st.button("💾 Commit Changes", key=f"track_commit_{project_code}_{year}"):
+        # Only the rows whose values changed are written (blank / 0 is stored as NULL)
+        before, after = original[value_cols], edited[value_cols]
+        changed = (before.ne(after) & ~(before.isna() & after.isna())).any(axis=1)
+        actual_rows = [
+            (project_code, section, material, idx, year,
+             float(abs_v) if abs_v else None, float(spec_v) if spec_v else None)
+            for section, idx, material, abs_v, spec_v in edited[changed].fillna(0.0).itertuples(index=False)
+        ]
+        amp_changed = (amp_v or None) != saved_amp
+        if actual_rows or amp_changed:
+            # One write transaction (one WAL commit) per batch
+            with write_txn(conn):
+                cursor.executemany(SQL_SAVE_PROJECT_ACTUAL, actual_rows)
+                if amp_changed:
+                    cursor.execute(SQL_SAVE_AMP_ACTUAL, (project_code, year, amp_v or None))
+            # Next render re-reads the year and starts the grid and AMP input from the committed values
+            track_cache.pop((project_code, year), None)
+            st.session_state.pop(grid_key, None)
+            st.session_state.pop(amp_key, None)
+            st.success("Saved")
 # --- MAIN ---
 def main():
+    # Counts full script runs (fragment reruns don't run main); pages use it to tell whether they were
+    # rendered in the previous run, i.e. whether Streamlit has kept their widget state
+    st.session_state['_app_run'] = st.session_state.get('_app_run', 0) + 1
     st.sidebar.title("🌿 Decarbonization Suite")
     page = st.sidebar.radio("Select Module",
                             ["Fuel & Energy Calculator",